@@ -0,0 +1,17 @@
+"""
+インポートパスの初期設定
+
+プロジェクトルート（config.py, logger.py などの既存モジュール）を
+sys.path に一度だけ追加する。main.py の先頭でインポートされる。
+
+先頭ではなく末尾に追加する。ルートにも main.py があるため、先頭に置くと
+uvicorn の "main:app" がルート側の main.py を読み込んでしまう。
+"""
+
+import os
+import sys
+
+PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if PARENT not in sys.path:
+    sys.path.append(PARENT)
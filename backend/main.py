@@ -3,68 +3,135 @@ FastAPI アプリケーション
 SPY Bull Put Credit Spread ダッシュボードのバックエンドAPI
 """
 
+import _bootstrap  # noqa: F401  プロジェクトルートをsys.pathに追加（最初にインポートする）
 import sys
-import os
 import asyncio
+import time
+import orjson
 from contextlib import asynccontextmanager
+from typing import Optional
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
+from datetime import datetime, timezone
 import pytz
 from dotenv import load_dotenv
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
 # .envファイルを読み込み
 load_dotenv()
 
-# 親ディレクトリをパスに追加（既存モジュールをインポートできるように）
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 import config
 from logger import get_logger
+from position import PositionManager
+from services.position_service import PositionService
+from ws.manager import manager, epoch_ms
+from ws.pubsub import bus
+from backend.services.auto_trader import run_auto_entry, run_position_monitor, set_scheduler_active
+
+UTC = timezone.utc
+ET = pytz.timezone('US/Eastern')
+
+logger = get_logger()
 
 # グローバル変数
+# ルーターからは request.app.state 経由で参照する（lifespanで同期）
 app_state = {
     'ibkr_connection': None,
+    'ibkr_service': None,
     'market_data_manager': None,
     'position_manager': None,
+    'position_service': None,
+    'fx_rate_manager': None,
     'logger': None
 }
 
+
+def _sync_app_state(app: FastAPI):
+    """app_stateの内容を app.state の属性に反映する"""
+    for key, value in app_state.items():
+        setattr(app.state, key, value)
+
 # APScheduler インスタンス（グローバル）
-scheduler = AsyncIOScheduler(timezone=pytz.timezone('US/Eastern'))
+# ジョブの起動判定・結果処理はスケジューラーのスレッドで行い、WebSocket配信を止めない
+# 遅延したジョブは1回にまとめて実行し、同じジョブを重ねて走らせない
+scheduler = BackgroundScheduler(
+    timezone=ET,
+    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 60}
+)
+
+
+# 値に変化がなくても再送する間隔（秒）。クライアント側でストリーム停止を検知できるようにする
+BROADCAST_KEEPALIVE_SEC = 30
+
+# 配信メッセージのテンプレート（ティックごとにdataとtimestampだけ書き換えて再利用）
+# 配信ループは1つだけで、publish()はawaitより前にエンコードを済ませるため使い回しても競合しない
+_SPY_MSG = {'type': 'spy_price', 'data': None, 'timestamp': None}
+_FX_MSG = {'type': 'fx_rate', 'data': None, 'timestamp': None}
+_SPY_UPDATE = ('spy', _SPY_MSG)
+_FX_UPDATE = ('fx', _FX_MSG)
 
 
 async def _broadcast_real_time_data(service):
     """
     リアルモード用: IBKRストリーミングデータをWebSocket経由でブロードキャスト（3秒ごと）
+
+    前回送信時から値が変わっていないチャンネルは送信しない。
+    ただしBROADCAST_KEEPALIVE_SEC秒ごとに変化がなくても再送する。
+
+    Pub/Sub経由の場合は他ワーカーの接続にも届くため、自プロセスの購読者数に関わらず配信する
     """
-    from ws.manager import manager
+    last_spy = None
+    last_fx = None
+    last_sent = 0.0
+    failures = 0
 
     while True:
         try:
-            if manager.get_connection_count() > 0:
-                spy_data = service.get_streaming_spy_price()
+            # spy/fxの購読者がいなければストリーミング値の読み出し自体を省略
+            if bus.is_remote or manager.has_subscribers('spy', 'fx'):
+                now = time.monotonic()
+                keepalive = now - last_sent >= BROADCAST_KEEPALIVE_SEC
+
+                # SPY/FXの更新を1フレームにまとめて送信（接続ごとのフレーム数を削減）
+                timestamp = epoch_ms()
+                updates = []
+
+                spy_data, fx_data = service.get_streaming_snapshot()
                 if spy_data:
-                    await manager.broadcast({
-                        'type': 'spy_price',
-                        'data': spy_data,
-                        'timestamp': datetime.now(pytz.UTC).isoformat()
-                    }, channel='spy')
+                    spy_key = (spy_data['last'], spy_data['bid'], spy_data['ask'])
+                    if keepalive or spy_key != last_spy:
+                        last_spy = spy_key
+                        _SPY_MSG['data'] = spy_data
+                        _SPY_MSG['timestamp'] = timestamp
+                        updates.append(_SPY_UPDATE)
 
-                fx_data = service.get_streaming_fx_rate()
                 if fx_data:
-                    await manager.broadcast({
-                        'type': 'fx_rate',
-                        'data': fx_data,
-                        'timestamp': datetime.now(pytz.UTC).isoformat()
-                    }, channel='fx')
+                    fx_key = fx_data['usd_jpy']
+                    if keepalive or fx_key != last_fx:
+                        last_fx = fx_key
+                        _FX_MSG['data'] = fx_data
+                        _FX_MSG['timestamp'] = timestamp
+                        updates.append(_FX_UPDATE)
 
-        except Exception as e:
-            pass  # ブロードキャストエラーは無視して継続
+                if updates:
+                    await bus.publish(updates)
+                    if keepalive:
+                        last_sent = now
+
+            failures = 0
 
-        await asyncio.sleep(3)
+        except (ConnectionError, RuntimeError, KeyError) as e:
+            # IBKR/WebSocket側の一時的なエラー: ログを溢れさせないようdebugで記録
+            failures += 1
+            logger.debug(f'リアルタイム配信エラー（{failures}回連続）: {e}')
+        except Exception:
+            failures += 1
+            logger.exception(f'リアルタイム配信で想定外のエラー（{failures}回連続）')
+
+        # 連続して失敗する間は待機時間を指数的に延ばす（最大30秒）
+        await asyncio.sleep(min(30, 3 * 2 ** failures) if failures else 3)
 
 
 def _setup_scheduler(service):
@@ -73,15 +140,22 @@ def _setup_scheduler(service):
 
     スケジュール:
     - 月曜 09:35 ET: 自動エントリー（Bull Put Spread 発注）
-    """
-    from backend.services.auto_trader import run_auto_entry, set_scheduler_active
 
+    ジョブはスケジューラーのスレッドで動き、非同期処理（IBKRServiceへの投入）だけを
+    メインのイベントループに渡して結果を待つ。
+    """
     entry_hour, entry_minute = config.ENTRY_TIME.split(':')
+    loop = asyncio.get_running_loop()
+
+    def _run_on_loop(coro, timeout: float):
+        """コルーチンをメインループで実行し、スケジューラースレッド側で結果を待つ"""
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
 
-    async def _scheduled_entry():
+    def _scheduled_entry():
         _logger = get_logger()
         _logger.info(f'[スケジューラー] 自動エントリー起動 ({config.ENTRY_TIME} ET)')
-        result = await run_auto_entry(service)
+        # run_auto_entry 内部のタイムアウト（120秒）より長めに待つ
+        result = _run_on_loop(run_auto_entry(service), 180)
         if result.get('success'):
             _logger.info(f'[スケジューラー] エントリー完了: {result}')
         else:
@@ -93,17 +167,16 @@ def _setup_scheduler(service):
             day_of_week='mon',
             hour=int(entry_hour),
             minute=int(entry_minute),
-            timezone=pytz.timezone('US/Eastern')
+            timezone=ET
         ),
         id='auto_entry',
         replace_existing=True
     )
 
     # ポジション監視: 平日マーケット時間中（9:30〜16:15 ET）に15分おき
-    async def _scheduled_monitor():
-        from backend.services.auto_trader import run_position_monitor
+    def _scheduled_monitor():
         _logger = get_logger()
-        actions = await run_position_monitor(service)
+        actions = _run_on_loop(run_position_monitor(service), 90)
         if actions:
             for a in actions:
                 _logger.warning(f'[監視] 損切り実行: {a["spread_id"]} | {a["reason"]}')
@@ -114,7 +187,7 @@ def _setup_scheduler(service):
             day_of_week='mon-fri',
             hour='9-16',
             minute='*/15',
-            timezone=pytz.timezone('US/Eastern')
+            timezone=ET
         ),
         id='position_monitor',
         replace_existing=True
@@ -142,10 +215,15 @@ async def lifespan(app: FastAPI):
     logger.info(f'Mode: {"Mock" if config.USE_MOCK_DATA else "Real"}')
     logger.info('=' * 60)
 
+    # WebSocket配信のPub/Sub接続（WS_BROADCAST_URL設定時のみ）
+    try:
+        await bus.connect(config.WS_BROADCAST_URL)
+    except Exception as e:
+        logger.warning(f'⚠️ Pub/Sub接続失敗（プロセス内配信を使用）: {e}')
+
     # 既存モジュールをインポート
     if config.USE_MOCK_DATA:
         from mock_data import MockIBKRConnection, MockMarketDataManager
-        from position import PositionManager
 
         logger.info('🎭 モックモードで起動中...')
 
@@ -156,12 +234,12 @@ async def lifespan(app: FastAPI):
         app_state['ibkr_connection'] = conn
         app_state['market_data_manager'] = MockMarketDataManager(conn.get_ib())
         app_state['position_manager'] = PositionManager()
+        app_state['position_service'] = PositionService(app_state['position_manager'])
 
         logger.info('✓ モック接続確立')
 
     else:
         from backend.services.ibkr_service import IBKRService
-        from position import PositionManager
 
         logger.info('📡 リアルモードで起動中...')
 
@@ -174,6 +252,14 @@ async def lifespan(app: FastAPI):
                 client_id=config.CLIENT_ID
             )
             logger.info('✓ IBKR接続確立（専用スレッド）')
+            if config.IBKR_POOL_SIZE > 0:
+                service.start_pool(
+                    config.IBKR_POOL_SIZE,
+                    host=config.TWS_HOST,
+                    port=config.TWS_PORT,
+                    base_client_id=config.IBKR_POOL_CLIENT_ID,
+                    burst_limit=config.IBKR_POOL_BURST_LIMIT
+                )
         except Exception as e:
             logger.warning(f'⚠️ IBKR接続失敗（TWSが起動しているか確認してください）: {e}')
             logger.warning(f'   接続先: {config.TWS_HOST}:{config.TWS_PORT}')
@@ -181,6 +267,7 @@ async def lifespan(app: FastAPI):
 
         app_state['ibkr_service'] = service
         app_state['position_manager'] = PositionManager()
+        app_state['position_service'] = PositionService(app_state['position_manager'])
 
         # ストリーミングとWebSocketブロードキャストを開始
         if service.is_connected:
@@ -198,6 +285,8 @@ async def lifespan(app: FastAPI):
         elif config.AUTO_EXECUTE and not service.is_connected:
             logger.warning('⚠️ AUTO_EXECUTE=True だが IBKR未接続のためスケジューラーを起動しません')
 
+    _sync_app_state(app)
+
     logger.info('FastAPI Dashboard Ready')
     logger.info('=' * 60)
 
@@ -211,6 +300,8 @@ async def lifespan(app: FastAPI):
         scheduler.shutdown(wait=False)
         logger.info('✓ スケジューラー停止')
 
+    await bus.disconnect()
+
     if config.USE_MOCK_DATA:
         if app_state.get('ibkr_connection'):
             app_state['ibkr_connection'].disconnect()
@@ -226,22 +317,30 @@ app = FastAPI(
     title="SPY Credit Spread Dashboard API",
     description="Bull Put Credit Spread 自動取引システムのバックエンドAPI",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
+_sync_app_state(app)
+app.state.scheduler = scheduler
+
+# CORS設定（フロントエンドのlocalhost各ポートを許可）
+# メソッド・ヘッダーは実際に使うものだけを列挙（CORS_DEV_MODE時のみワイルドカード）
+CORS_ORIGINS = (
+    "http://localhost:3000",
+    "http://localhost:3001",
+    "http://localhost:3002",
+    "http://127.0.0.1:3000",
+    "http://127.0.0.1:3001",
+)
+CORS_METHODS = ("*",) if config.CORS_DEV_MODE else ("GET", "POST", "PUT", "DELETE", "OPTIONS")
+CORS_HEADERS = ("*",) if config.CORS_DEV_MODE else ("Authorization", "Content-Type")
 
-# CORS設定（開発環境：localhost全ポート許可）
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "http://localhost:3001",
-        "http://localhost:3002",
-        "http://127.0.0.1:3000",
-        "http://127.0.0.1:3001",
-    ],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=CORS_METHODS,
+    allow_headers=CORS_HEADERS,
 )
 
 
@@ -285,62 +384,83 @@ async def health_check():
         "mode": "mock" if config.USE_MOCK_DATA else "real",
         "auto_execute": config.AUTO_EXECUTE,
         "scheduler_running": scheduler.running,
-        "timestamp": datetime.now(pytz.UTC).isoformat()
+        "timestamp": datetime.now(UTC).isoformat()
     }
 
 
+async def _ws_subscribe(websocket: WebSocket, channel: str):
+    """チャンネル購読"""
+    await manager.subscribe(websocket, channel)
+    await manager.send_personal_message({
+        "type": "subscribed",
+        "channel": channel
+    }, websocket)
+
+
+async def _ws_unsubscribe(websocket: WebSocket, channel: str):
+    """チャンネル購読解除"""
+    await manager.unsubscribe(websocket, channel)
+    await manager.send_personal_message({
+        "type": "unsubscribed",
+        "channel": channel
+    }, websocket)
+
+
+async def _ws_ping(websocket: WebSocket, channel: str):
+    """ping応答（エンコード済みのpongを送信）"""
+    await manager.send_pong(websocket)
+
+
+# クライアントから受け付けるアクション
+WS_ACTIONS = {
+    'subscribe': _ws_subscribe,
+    'unsubscribe': _ws_unsubscribe,
+    'ping': _ws_ping,
+}
+
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+@app.websocket("/ws/{shard_id}")
+async def websocket_endpoint(websocket: WebSocket, shard_id: Optional[int] = None):
     """
     WebSocketエンドポイント
     リアルタイム価格配信用
-    """
-    from ws.manager import manager
-    import json
 
-    await manager.connect(websocket)
+    Args:
+        shard_id: シャードID（複数ワーカー構成でリバースプロキシが振り分けに使うキー。
+                  サーバー側では参照しない）
+    """
+    # ?fmt=msgpack でMessagePackバイナリフレーム配信（デフォルトはJSON）
+    await manager.connect(websocket, fmt=websocket.query_params.get('fmt', 'json'))
 
     try:
         while True:
             # クライアントからのメッセージを受信
             data = await websocket.receive_text()
-            message = json.loads(data)
-
-            action = message.get('action')
-            channel = message.get('channel', 'all')
-
-            if action == 'subscribe':
-                await manager.subscribe(websocket, channel)
-                await manager.send_personal_message({
-                    "type": "subscribed",
-                    "channel": channel
-                }, websocket)
-
-            elif action == 'unsubscribe':
-                await manager.unsubscribe(websocket, channel)
-                await manager.send_personal_message({
-                    "type": "unsubscribed",
-                    "channel": channel
-                }, websocket)
-
-            elif action == 'ping':
-                await manager.send_personal_message({
-                    "type": "pong"
-                }, websocket)
+            message = orjson.loads(data)
+
+            handler = WS_ACTIONS.get(message.get('action'))
+            if handler:
+                await handler(websocket, message.get('channel', 'all'))
 
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.warning(f'WebSocketエラー: {e}')
         manager.disconnect(websocket)
 
 
 if __name__ == "__main__":
     import uvicorn
+    # モックモードはuvloop + httptoolsで高速化（uvicorn[standard]に同梱）
+    # リアルモードはib_insyncのpatchAsyncio（nest_asyncio）がuvloopを扱えないため標準のasyncioを使う
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
         reload=True,
-        log_level="info"
+        log_level="info",
+        loop="uvloop" if config.USE_MOCK_DATA and sys.platform != "win32" else "asyncio",
+        http="httptools",
+        ws="websockets"
     )
@@ -2,9 +2,20 @@
 Pydanticスキーマ: API リクエスト/レスポンスのデータモデル
 """
 
-from pydantic import BaseModel
-from datetime import datetime, date
-from typing import Optional, List
+from pydantic import BaseModel, PlainSerializer
+from datetime import datetime, date, timezone
+from typing import Annotated, Optional, List
+
+
+def _datetime_to_epoch_ms(value: datetime) -> int:
+    """datetimeをUNIXエポックからのミリ秒に変換（ナイーブな値はUTCとみなす）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+# JSON化するとエポックミリ秒の整数になるdatetime（WebSocket配信のtimestampと同じ形式）
+EpochMs = Annotated[datetime, PlainSerializer(_datetime_to_epoch_ms, return_type=int, when_used='json')]
 
 
 # --- 口座 ---
@@ -23,7 +34,7 @@ class SpyPrice(BaseModel):
     bid: Optional[float]
     ask: Optional[float]
     mid: Optional[float]
-    timestamp: datetime
+    timestamp: EpochMs
     is_delayed: bool = False
 
 
@@ -141,7 +152,7 @@ class WsMarketUpdate(BaseModel):
     """WebSocketマーケット更新"""
     type: str  # "spy_price" / "option_update" / "fx_rate"
     data: dict
-    timestamp: datetime
+    timestamp: int  # UNIXエポックからのミリ秒
 
 
 # --- ヘルスチェック ---
@@ -0,0 +1,25 @@
+"""
+ルーター共通の日時フォーマット
+
+固定の数値書式はstrftimeを使わず属性から直接組み立てる（ロケール処理を通らない分速い）。
+"""
+
+from datetime import date, datetime
+
+
+def ymd(d: date) -> str:
+    """YYYY-MM-DD"""
+    return f'{d.year:04d}-{d.month:02d}-{d.day:02d}'
+
+
+def hm(dt: datetime) -> str:
+    """HH:MM"""
+    return f'{dt.hour:02d}:{dt.minute:02d}'
+
+
+def ymdhms(dt: datetime) -> str:
+    """YYYY-MM-DD HH:MM:SS"""
+    return (
+        f'{dt.year:04d}-{dt.month:02d}-{dt.day:02d} '
+        f'{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}'
+    )
@@ -5,10 +5,63 @@ Claude チャットAPIルーター
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
+from functools import lru_cache
 import os
 
+try:
+    from anthropic import AsyncAnthropic
+except ImportError:  # SDK未インストール時はエンドポイント側で案内を返す
+    AsyncAnthropic = None
+
 router = APIRouter()
 
+# システムプロンプト
+_SYSTEM_PROMPT = """あなたはSPYクレジットスプレッド取引の専門アドバイザーです。
+
+以下のトピックについてユーザーをサポートしてください:
+- SPY（S&P 500 ETF）のBull Put Credit Spread戦略
+- オプション取引の基礎（デルタ、IV、DTE等のGreeks）
+- リスク管理とポジションサイジング
+- 税務申告（日本の雑所得）
+- 為替レート（USD/JPY）の影響
+- IBKR（Interactive Brokers）の使い方
+
+回答は:
+- 簡潔で分かりやすく
+- 日本語で
+- 必要に応じて具体例を示す
+- リスクについても正直に説明する
+
+ユーザーの現在の設定:
+- 元金: $10,000 USD
+- スプレッド幅: $5
+- 目標デルタ: 0.20 (勝率約80%)
+- リスク/トレード: 資金の8%
+- DTE範囲: 1〜7日
+"""
+
+# プロンプトキャッシュ用: 毎回同一のプレフィックスになるようシステムプロンプトをブロック形式で固定
+_EPHEMERAL = {"type": "ephemeral"}
+_SYSTEM_BLOCKS = [{"type": "text", "text": _SYSTEM_PROMPT, "cache_control": _EPHEMERAL}]
+
+# 送信する会話履歴の最大件数（古いものから切り捨てる）
+_HISTORY_WINDOW = 20
+_ALLOWED_ROLES = frozenset(("user", "assistant"))
+
+
+@lru_cache(maxsize=1)
+def _get_client(api_key: str):
+    """
+    非同期Anthropicクライアントを取得（APIキーごとに1つを使い回し、接続プールを再利用する）
+
+    Args:
+        api_key: Anthropic APIキー
+
+    Returns:
+        AsyncAnthropic: クライアント
+    """
+    return AsyncAnthropic(api_key=api_key)
+
 
 class Message(BaseModel):
     """メッセージモデル"""
@@ -50,24 +103,31 @@ async def chat_with_claude(request: ChatRequest):
             )
 
         # Anthropic SDK を使用
-        try:
-            from anthropic import Anthropic
-        except ImportError:
+        if AsyncAnthropic is None:
             return ChatResponse(
                 response="Anthropic SDKがインストールされていません。\n\n"
                          "`pip install anthropic` を実行してください。"
             )
 
-        client = Anthropic(api_key=api_key)
-
-        # 会話履歴を構築
-        messages = []
-        for msg in request.conversation_history:
-            if msg.role in ['user', 'assistant']:
-                messages.append({
-                    "role": msg.role,
-                    "content": msg.content
-                })
+        client = _get_client(api_key)
+
+        # 会話履歴を構築（直近_HISTORY_WINDOW件のみ）
+        history = (request.conversation_history or [])[-_HISTORY_WINDOW:]
+        messages = [
+            {"role": msg.role, "content": msg.content}
+            for msg in history if msg.role in _ALLOWED_ROLES
+        ]
+        # 切り捨てにより先頭がassistantになった場合は除く（先頭はuserである必要がある）
+        if messages and messages[0]["role"] == "assistant":
+            messages.pop(0)
+
+        # 会話履歴の末尾にキャッシュ境界を置き、次のターンでは履歴部分をキャッシュから読ませる
+        if messages:
+            messages[-1]["content"] = [{
+                "type": "text",
+                "text": messages[-1]["content"],
+                "cache_control": _EPHEMERAL
+            }]
 
         # 新しいメッセージを追加
         messages.append({
@@ -75,36 +135,11 @@ async def chat_with_claude(request: ChatRequest):
             "content": request.message
         })
 
-        # システムプロンプト
-        system_prompt = """あなたはSPYクレジットスプレッド取引の専門アドバイザーです。
-
-以下のトピックについてユーザーをサポートしてください:
-- SPY（S&P 500 ETF）のBull Put Credit Spread戦略
-- オプション取引の基礎（デルタ、IV、DTE等のGreeks）
-- リスク管理とポジションサイジング
-- 税務申告（日本の雑所得）
-- 為替レート（USD/JPY）の影響
-- IBKR（Interactive Brokers）の使い方
-
-回答は:
-- 簡潔で分かりやすく
-- 日本語で
-- 必要に応じて具体例を示す
-- リスクについても正直に説明する
-
-ユーザーの現在の設定:
-- 元金: $10,000 USD
-- スプレッド幅: $5
-- 目標デルタ: 0.20 (勝率約80%)
-- リスク/トレード: 資金の8%
-- DTE範囲: 1〜7日
-"""
-
-        # Claude API呼び出し
-        response = client.messages.create(
+        # Claude API呼び出し（イベントループをブロックしないようawaitする）
+        response = await client.messages.create(
             model="claude-sonnet-4-5-20250929",  # 最新のSonnet 4.5
             max_tokens=1024,
-            system=system_prompt,
+            system=_SYSTEM_BLOCKS,
             messages=messages
         )
 
@@ -2,16 +2,21 @@
 為替レートAPIルーター
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Optional
-import sys
-import os
+from typing import Optional, Tuple
+import asyncio
+import time
+
+from services.fx_service import FxService
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 router = APIRouter()
 
+# 直前の為替レート（取得時刻, レート情報）。レートの更新は高々1秒に1回
+FX_CACHE_TTL = 2.0  # 秒
+_fx_cache: Tuple[float, Optional[dict]] = (0.0, None)
+
 
 class ManualFxRateRequest(BaseModel):
     """手動為替レート設定リクエスト"""
@@ -20,24 +25,30 @@ class ManualFxRateRequest(BaseModel):
 
 
 @router.get("/fx/rate")
-async def get_fx_rate():
+async def get_fx_rate(request: Request):
     """
     現在のUSD/JPY為替レートを取得
 
     Returns:
         dict: 為替レート情報
     """
-    from main import app_state
+    global _fx_cache
+
+    cached_at, cached = _fx_cache
+    if cached is not None and time.monotonic() - cached_at < FX_CACHE_TTL:
+        return cached
 
     try:
         # FXRateManagerを取得（存在しない場合もある）
-        fx_manager = app_state.get('fx_rate_manager')
-
-        from services.fx_service import FxService
+        fx_manager = request.app.state.fx_rate_manager
 
         fx_service = FxService(fx_manager)
-        rate_data = fx_service.get_current_rate()
+        # FXRateManagerは外部APIへ同期的に問い合わせることがあるため別スレッドで実行
+        rate_data = await asyncio.to_thread(fx_service.get_current_rate)
 
+        # 取得失敗時のフォールバック値はキャッシュせず、次のリクエストで再取得する
+        if rate_data.get('source') != 'fallback':
+            _fx_cache = (time.monotonic(), rate_data)
         return rate_data
 
     except Exception as e:
@@ -56,8 +67,6 @@ async def set_manual_fx_rate(request: ManualFxRateRequest):
         dict: 設定されたレート情報
     """
     try:
-        from services.fx_service import FxService
-
         fx_service = FxService(None)  # 手動設定なのでfx_managerは不要
         rate_data = fx_service.set_manual_rate(
             usd_jpy=request.usd_jpy,
@@ -86,8 +95,6 @@ async def calculate_tts_rate(spot_rate: float, margin: float = 1.0):
         dict: TTSレート
     """
     try:
-        from services.fx_service import FxService
-
         fx_service = FxService(None)
         tts_rate = fx_service.calculate_tts_rate(spot_rate, margin)
 
@@ -2,33 +2,69 @@
 マーケットデータAPIルーター
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from models.schemas import SpyPrice
 from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import math
+import time
 import pytz
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 import config
+from ib_insync import Stock, Index
 
 router = APIRouter()
 
+# 直前に取得したSPY価格（取得時刻, データ）。ポーリングが重なってもIBKRへは問い合わせない
+SPY_CACHE_TTL = 0.5  # 秒
+_spy_cache: Tuple[float, Optional[dict]] = (0.0, None)
+
+# 直前のVIXレスポンス（取得時刻, レスポンス）。VIXの更新は高々1秒に1回
+VIX_CACHE_TTL = 2.0  # 秒
+_vix_cache: Tuple[float, Optional[dict]] = (0.0, None)
+
+# 実行中の取得処理（キー -> Task）。同じキーの同時リクエストは1つの取得結果を共有する
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _nz(value) -> Optional[float]:
+    """IBKRのTicker値を正規化（None/NaNはNone）"""
+    return value if (value is not None and not math.isnan(value)) else None
+
+
+async def _single_flight(key: str, factory: Callable[[], Awaitable]):
+    """
+    同じキーの取得処理が実行中ならその結果を待ち、なければ新しく開始する
+
+    待機側のリクエストがキャンセルされても共有中の取得処理は止めない。
+
+    Args:
+        key: 取得処理を識別するキー
+        factory: 取得処理のコルーチンを返す関数
+
+    Returns:
+        取得処理の結果
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
 
 @router.get("/market/spy", response_model=SpyPrice)
-async def get_spy_price():
+async def get_spy_price(request: Request):
     """
     SPY現在価格を取得
 
     Returns:
         SpyPrice: SPY価格情報
     """
-    from main import app_state
-
     if config.USE_MOCK_DATA:
         # モックモード: MarketDataManagerを使用
-        market_data = app_state.get('market_data_manager')
+        market_data = request.app.state.market_data_manager
         if not market_data:
             raise HTTPException(status_code=503, detail="Market data manager not available")
 
@@ -54,10 +90,10 @@ async def get_spy_price():
 
     else:
         # リアルモード: IBKRServiceを使用（新パターン）
-        from backend.services.ibkr_service import IBKRService
-        from ib_insync import Stock
+        # ibkr_serviceはインポート時にasyncioをパッチするためリアルモードでのみ読み込む
+        from backend.services.ibkr_service import wait_for_tickers
 
-        service = app_state.get('ibkr_service')
+        service = request.app.state.ibkr_service
         if not service or not service.is_connected:
             raise HTTPException(status_code=503, detail="IBKR not connected")
 
@@ -66,15 +102,19 @@ async def get_spy_price():
             def _fetch_spy_price(ib):
                 contract = Stock('SPY', 'SMART', 'USD')
                 ib.qualifyContracts(contract)
-                ib.reqMktData(contract, '', False, False)
-                ib.sleep(2)  # データ到着を待つ
-                ticker = ib.ticker(contract)
+                ticker = ib.reqMktData(contract, '', False, False)
+                # last または bid/ask が届いた時点で待機終了（最大2秒）
+                wait_for_tickers(
+                    ib, [ticker],
+                    lambda t: _nz(t.last) is not None or (_nz(t.bid) is not None and _nz(t.ask) is not None),
+                    timeout=2
+                )
                 ib.cancelMktData(contract)
 
                 # データ整形
-                last = ticker.last if ticker.last == ticker.last else None  # NaNチェック
-                bid = ticker.bid if ticker.bid == ticker.bid else None
-                ask = ticker.ask if ticker.ask == ticker.ask else None
+                last = _nz(ticker.last)
+                bid = _nz(ticker.bid)
+                ask = _nz(ticker.ask)
 
                 if not last and bid and ask:
                     last = (bid + ask) / 2
@@ -88,7 +128,16 @@ async def get_spy_price():
                     'mid': mid or last or 0,
                 }
 
-            data = await service.execute(_fetch_spy_price, service.ib)
+            async def _load_spy_price() -> dict:
+                global _spy_cache
+                async with service.acquire() as ib:
+                    result = await service.execute(_fetch_spy_price, ib)
+                _spy_cache = (time.monotonic(), result)
+                return result
+
+            cached_at, data = _spy_cache
+            if data is None or time.monotonic() - cached_at >= SPY_CACHE_TTL:
+                data = await _single_flight('SPY', _load_spy_price)
 
             return SpyPrice(
                 last=data['last'],
@@ -104,14 +153,18 @@ async def get_spy_price():
 
 
 @router.get("/market/vix")
-async def get_vix_level():
+async def get_vix_level(request: Request):
     """
     VIX水準を取得
 
     Returns:
         dict: VIX情報
     """
-    from main import app_state
+    global _vix_cache
+
+    cached_at, cached = _vix_cache
+    if cached is not None and time.monotonic() - cached_at < VIX_CACHE_TTL:
+        return cached
 
     if config.USE_MOCK_DATA:
         # モックモードではダミーデータ
@@ -123,10 +176,9 @@ async def get_vix_level():
 
     else:
         # リアルモード: VIX取得（インデックスとして）
-        from backend.services.ibkr_service import IBKRService
-        from ib_insync import Index
+        from backend.services.ibkr_service import wait_for_tickers
 
-        service = app_state.get('ibkr_service')
+        service = request.app.state.ibkr_service
         if not service or not service.is_connected:
             raise HTTPException(status_code=503, detail="IBKR not connected")
 
@@ -134,15 +186,20 @@ async def get_vix_level():
             def _fetch_vix(ib):
                 contract = Index('VIX', 'CBOE')
                 ib.qualifyContracts(contract)
-                ib.reqMktData(contract, '', False, False)
-                ib.sleep(2)
-                ticker = ib.ticker(contract)
+                ticker = ib.reqMktData(contract, '', False, False)
+                # last が届いた時点で待機終了（最大2秒）
+                # closeは前日終値で先に届くことが多いため、待機の終了条件にはせずタイムアウト後の代替にだけ使う
+                wait_for_tickers(
+                    ib, [ticker],
+                    lambda t: _nz(t.last) is not None,
+                    timeout=2
+                )
                 ib.cancelMktData(contract)
 
-                last = ticker.last if ticker.last == ticker.last else None
-                close = ticker.close if ticker.close == ticker.close else None
-                bid = ticker.bid if ticker.bid == ticker.bid else None
-                ask = ticker.ask if ticker.ask == ticker.ask else None
+                last = _nz(ticker.last)
+                close = _nz(ticker.close)
+                bid = _nz(ticker.bid)
+                ask = _nz(ticker.ask)
 
                 return {
                     'vix': last or close,
@@ -150,15 +207,19 @@ async def get_vix_level():
                     'ask': ask,
                 }
 
-            data = await service.execute(_fetch_vix, service.ib)
+            async with service.acquire() as ib:
+                data = await service.execute(_fetch_vix, ib)
 
-            return {
+            response = {
                 "vix": data['vix'],
                 "bid": data['bid'],
                 "ask": data['ask'],
                 "timestamp": datetime.now(pytz.UTC).isoformat(),
                 "is_delayed": (config.MARKET_DATA_TYPE == 3 or config.MARKET_DATA_TYPE == 4)
             }
+            # 取得失敗時のフォールバックはキャッシュせず、次のリクエストで再取得する
+            _vix_cache = (time.monotonic(), response)
+            return response
 
         except Exception as e:
             # VIX取得失敗時はモックデータを返す
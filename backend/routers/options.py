@@ -2,20 +2,164 @@
 オプションAPIルーター
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from typing import Dict, List
+from datetime import date, datetime
+import asyncio
+import bisect
+import logging
+import math
+import time
+import numpy as np
 
 import config
+from ib_insync import Stock, Option
+from services.options_service import OptionsService
+
+__all__ = ["router"]
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _parse_expiry(exp_str: str) -> date:
+    """満期日文字列（YYYYMMDD）をdateに変換（strptimeより高速な整数スライス）"""
+    return date(int(exp_str[:4]), int(exp_str[4:6]), int(exp_str[6:8]))
+
+
+def _score_candidates(
+    expiries: list,
+    strikes: np.ndarray,
+    exp_info: dict,
+    deltas: np.ndarray,
+    ivs: np.ndarray,
+    bids: np.ndarray,
+    asks: np.ndarray,
+) -> list:
+    """
+    スプレッド候補の指標をNumPyでまとめて計算し、スコア順に並べる
+
+    Args:
+        expiries: 満期日文字列（各配列とインデックスで対応）
+        strikes: ショートストライク
+        exp_info: 満期日文字列 -> (満期日, DTE)
+        deltas: デルタ（欠損はNaN）
+        ivs: IV（欠損はNaN）
+        bids: ビッド（欠損はNaN）
+        asks: アスク（欠損はNaN）
+
+    Returns:
+        list: スコア降順のスプレッド候補
+              （指標はNumPyスカラーのまま。ORJSONResponseがNaNをnullとして出力する）
+    """
+    if not expiries:
+        return []
+
+    width = config.SPREAD_WIDTH
+    abs_delta = np.abs(deltas)
+
+    # 0以下のbid/askは欠損扱い
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bid = np.where(bids > 0, bids, np.nan)
+        ask = np.where(asks > 0, asks, np.nan)
+        mid = (bid + ask) / 2
+
+        max_profit = mid * 100
+        max_loss = np.where(mid < width, (width - mid) * 100, np.nan)
+        win_prob = 1 - abs_delta
+        score = win_prob * max_profit / max_loss
+        # 計算できない（NaN）または勝率0の候補はスコア0
+        score = np.where(np.isnan(score) | ~(max_loss > 0) | (win_prob == 0), 0.0, score)
+        risk_reward = max_loss / max_profit
+
+    candidates = []
+    for i in np.argsort(-score, kind='stable'):
+        exp_str = expiries[i]
+        strike = strikes[i]
+        exp_date, dte = exp_info[exp_str]
+        candidates.append({
+            'short_strike': strike,
+            'long_strike': strike - width,
+            'expiry': exp_str,
+            'exp_date': exp_date.strftime('%Y-%m-%d'),
+            'dte': dte,
+            'short_delta': abs_delta[i],
+            'short_iv': ivs[i],
+            'spread_premium_mid': mid[i],
+            'max_profit': max_profit[i],
+            'max_loss': max_loss[i],
+            'risk_reward_ratio': risk_reward[i],
+            'win_probability': win_prob[i],
+            'score': score[i],
+        })
+    return candidates
+
+
+# オプションチェーン定義のキャッシュ（満期日・ストライク一覧は日中ほぼ変わらない）
+CHAIN_CACHE_TTL = 300  # 秒
+_chain_cache: Dict[str, tuple] = {}  # シンボル -> (取得時刻, 検証済み株式契約, チェーン一覧, ソート済みストライク一覧)
+_chain_locks: Dict[str, list] = {}  # シンボル -> [ロック, 取得中・待機中の呼び出し数]
+
+
+async def _get_option_chains(service, symbol: str = 'SPY', ttl: float = CHAIN_CACHE_TTL) -> tuple:
+    """
+    原資産契約の検証とオプションチェーン定義の取得（TTLキャッシュ付き）
+
+    同時リクエストが重なってもIBKRへの問い合わせは1回にまとめる。
+
+    Args:
+        service: IBKRService
+        symbol: 原資産シンボル
+        ttl: キャッシュ有効期間（秒）
+
+    Returns:
+        tuple: (検証済み株式契約, reqSecDefOptParamsの結果,
+                各チェーンのソート済みストライク（chainsとインデックスで対応）)
+    """
+    entry = _chain_locks.setdefault(symbol, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            cached = _chain_cache.get(symbol)
+            if cached and time.monotonic() - cached[0] < ttl:
+                return cached[1:]
+
+            def _fetch_chains(ib):
+                contract = Stock(symbol, 'SMART', 'USD')
+                ib.qualifyContracts(contract)
+                chains = ib.reqSecDefOptParams(contract.symbol, '', contract.secType, contract.conId)
+                return contract, chains
+
+            async with service.acquire() as ib:
+                contract, chains = await service.execute(_fetch_chains, ib)
+            # ストライクはキャッシュ時に一度だけソートし、以降は二分探索で範囲を切り出す
+            sorted_strikes = [tuple(sorted(c.strikes)) for c in chains]
+            if chains:
+                _chain_cache[symbol] = (time.monotonic(), contract, chains, sorted_strikes)
+            return contract, chains, sorted_strikes
+    finally:
+        # ロックは取得中の重複をまとめるためだけのもの。待っている呼び出しがなくなったら外し、
+        # リクエストのsymbolごとにロックが溜まり続けないようにする
+        # （解放直後でまだロックを取れていない待機中の呼び出しも数に含まれる）
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _chain_locks[symbol]
+
+
+def _option_ticker_ready(ticker) -> bool:
+    """オプションTickerにデルタとbid/askが揃ったか"""
+    greeks = ticker.modelGreeks or ticker.bidGreeks or ticker.lastGreeks
+    return (
+        greeks is not None and greeks.delta is not None
+        and not math.isnan(ticker.bid) and not math.isnan(ticker.ask)
+    )
 
 
 @router.get("/options/chain")
 async def get_options_chain(
+    request: Request,
     symbol: str = Query(default="SPY", description="シンボル"),
     dte_min: int = Query(default=1, description="最小DTE"),
     dte_max: int = Query(default=7, description="最大DTE")
@@ -31,54 +175,42 @@ async def get_options_chain(
     Returns:
         list: オプションデータ
     """
-    from main import app_state
-
     if config.USE_MOCK_DATA:
         # モックモード
-        market_data = app_state.get('market_data_manager')
+        market_data = request.app.state.market_data_manager
         if not market_data:
             raise HTTPException(status_code=503, detail="Market data manager not available")
 
         try:
-            from services.options_service import OptionsService
-
             options_service = OptionsService(market_data)
-            options_data = options_service.get_options_chain(
+            # DataFrameの組み立てはイベントループを塞がないよう別スレッドで行う
+            options_data = await asyncio.to_thread(
+                options_service.get_options_chain,
                 symbol=symbol,
                 dte_min=dte_min,
                 dte_max=dte_max
             )
 
-            return {
+            return ORJSONResponse({
                 "symbol": symbol,
                 "dte_range": [dte_min, dte_max],
                 "options_count": len(options_data),
                 "options": options_data
-            }
+            })
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get options chain: {str(e)}")
 
     else:
         # リアルモード: IBKRServiceを使用
-        from backend.services.ibkr_service import IBKRService
-        from ib_insync import Stock
-        from datetime import datetime, timedelta
 
-        service = app_state.get('ibkr_service')
+        service = request.app.state.ibkr_service
         if not service or not service.is_connected:
             raise HTTPException(status_code=503, detail="IBKR not connected")
 
         try:
-            # SPY契約を作成
-            contract = Stock(symbol, 'SMART', 'USD')
-
-            # 契約を検証
-            await service.run(service.ib.qualifyContracts, contract)
-
-            # オプションパラメータを取得
-            chains = await service.run(service.ib.reqSecDefOptParams,
-                                      contract.symbol, '', contract.secType, contract.conId)
+            # 契約の検証とオプションパラメータの取得（キャッシュ付き）
+            _, chains, _ = await _get_option_chains(service, symbol)
 
             if not chains:
                 raise HTTPException(status_code=404, detail="No option chains found")
@@ -90,20 +222,20 @@ async def get_options_chain(
             today = datetime.now().date()
             filtered_expirations = []
             for exp_str in sorted(chain.expirations):
-                exp_date = datetime.strptime(exp_str, '%Y%m%d').date()
+                exp_date = _parse_expiry(exp_str)
                 dte = (exp_date - today).days
 
                 if dte_min <= dte <= dte_max:
                     filtered_expirations.append(exp_str)
 
             # 簡易的なオプションデータを返す（詳細取得は別途実装）
-            return {
+            return ORJSONResponse({
                 "symbol": symbol,
                 "dte_range": [dte_min, dte_max],
                 "expirations": filtered_expirations,
                 "strikes_count": len(chain.strikes),
                 "note": "Real mode - detailed option data requires additional implementation"
-            }
+            })
 
         except HTTPException:
             raise
@@ -112,54 +244,51 @@ async def get_options_chain(
 
 
 @router.get("/options/spreads")
-async def get_spread_candidates():
+async def get_spread_candidates(request: Request):
     """
     スプレッド候補を取得
 
     Returns:
         list: スプレッド候補のリスト
     """
-    from main import app_state
-
     if config.USE_MOCK_DATA:
         # モックモード
-        market_data = app_state.get('market_data_manager')
+        market_data = request.app.state.market_data_manager
         if not market_data:
             raise HTTPException(status_code=503, detail="Market data manager not available")
 
         try:
-            from services.options_service import OptionsService
-
             options_service = OptionsService(market_data)
-            candidates = options_service.get_spread_candidates()
+            candidates = await asyncio.to_thread(options_service.get_spread_candidates)
 
-            return {
+            return ORJSONResponse({
                 "candidates_count": len(candidates),
                 "candidates": candidates
-            }
+            })
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get spread candidates: {str(e)}")
 
     else:
         # リアルモード: IBKRからオプションデータを取得
-        from backend.services.ibkr_service import IBKRService
-        from ib_insync import Stock, Option
-        from datetime import datetime
-        import math
+        # ibkr_serviceはインポート時にasyncioをパッチするためリアルモードでのみ読み込む
+        from backend.services.ibkr_service import wait_for_tickers
 
-        service = app_state.get('ibkr_service')
+        service = request.app.state.ibkr_service
         if not service or not service.is_connected:
             raise HTTPException(status_code=503, detail="IBKR not connected")
 
         try:
-            def _fetch_spread_candidates(ib):
+            def _fetch_spread_candidates(ib, spy_contract, chains, strikes_by_chain):
                 # 1. SPY現在価格を取得
-                spy_contract = Stock('SPY', 'SMART', 'USD')
-                ib.qualifyContracts(spy_contract)
-                ib.reqMktData(spy_contract, '', False, False)
-                ib.sleep(2)
-                spy_ticker = ib.ticker(spy_contract)
+                # closeは前日終値で先に届くことが多いため、last（なければbid/ask）を待つ。
+                # どちらも届かなければタイムアウト後にcloseを使う
+                spy_ticker = ib.reqMktData(spy_contract, '', False, False)
+                wait_for_tickers(
+                    ib, [spy_ticker],
+                    lambda t: not math.isnan(t.last) or (not math.isnan(t.bid) and not math.isnan(t.ask)),
+                    timeout=2
+                )
                 ib.cancelMktData(spy_contract)
 
                 spy_price = spy_ticker.last
@@ -170,20 +299,21 @@ async def get_spread_candidates():
                     ask = spy_ticker.ask if spy_ticker.ask and not math.isnan(spy_ticker.ask) else 0
                     spy_price = (bid + ask) / 2 if bid and ask else 580
 
-                # 2. オプションチェーンのパラメータを取得
-                chains = ib.reqSecDefOptParams('SPY', '', 'STK', spy_contract.conId)
+                # 2. オプションチェーンのパラメータ（呼び出し前に取得済み）
                 if not chains:
                     return []
 
                 # 最も多くの期限を持つチェーンを選択（近期オプションを含む）
                 # ※ SMARTチェーンは近期オプションを含まないため、最大チェーンを使用
-                chain = max(chains, key=lambda c: len(c.expirations))
+                chain_idx = max(range(len(chains)), key=lambda i: len(chains[i].expirations))
+                chain = chains[chain_idx]
+                sorted_strikes = strikes_by_chain[chain_idx]
 
                 # 3. DTE範囲でフィルタリング
                 today = datetime.now().date()
                 valid_expirations = []
                 for exp_str in sorted(chain.expirations):
-                    exp_date = datetime.strptime(exp_str, '%Y%m%d').date()
+                    exp_date = _parse_expiry(exp_str)
                     dte = (exp_date - today).days
                     if config.MIN_DTE <= dte <= config.MAX_DTE:
                         valid_expirations.append((exp_str, exp_date, dte))
@@ -192,139 +322,109 @@ async def get_spread_candidates():
                     return []
 
                 # 4. ATM近辺のストライクに絞る（SPY価格の85%〜100%）
-                target_strikes_all = sorted([
-                    s for s in chain.strikes
-                    if spy_price * 0.85 <= s < spy_price
-                ])
+                lo = bisect.bisect_left(sorted_strikes, spy_price * 0.85)
+                hi = bisect.bisect_left(sorted_strikes, spy_price)
+                target_strikes_all = sorted_strikes[lo:hi]
                 target_strikes = target_strikes_all[-15:] if len(target_strikes_all) > 15 else target_strikes_all
 
-                candidates = []
-
-                # 5. 各期限についてオプションデータを取得（最大2期限）
-                for exp_str, exp_date, dte in valid_expirations[:2]:
-                    # tradingClass='SPY'を指定してAmbiguous contractエラーを回避
-                    option_contracts = [
-                        Option('SPY', exp_str, strike, 'P', 'SMART', tradingClass='SPY')
-                        for strike in target_strikes
-                    ]
-
-                    # 契約を検証
-                    try:
-                        ib.qualifyContracts(*option_contracts)
-                        option_contracts = [c for c in option_contracts if c.conId]
-                    except Exception as qe:
-                        import logging
-                        logging.getLogger(__name__).warning(f'qualifyContracts failed for {exp_str}: {qe}')
-                        continue
-
-                    if not option_contracts:
-                        continue
-
-                    # マーケットデータをリクエスト（Greeksを含む）
-                    tickers_map = {}
-                    for opt in option_contracts:
-                        t = ib.reqMktData(opt, '100,101,105,106', False, False)
-                        tickers_map[opt.strike] = (opt, t)
-
-                    ib.sleep(5)  # データ到着を待つ
-
-                    for strike, (opt, ticker) in tickers_map.items():
-                        ib.cancelMktData(opt)
-
-                        if not ticker:
-                            continue
-
-                        # デルタを取得（modelGreeks > bidGreeks > lastGreeks の順）
-                        greeks = ticker.modelGreeks or ticker.bidGreeks or ticker.lastGreeks
-                        delta = None
-                        iv = None
-                        if greeks:
-                            if greeks.delta is not None and not math.isnan(greeks.delta):
-                                delta = greeks.delta
-                            if greeks.impliedVol is not None and not math.isnan(greeks.impliedVol):
-                                iv = greeks.impliedVol
-
-                        abs_delta = abs(delta) if delta is not None else None
-
-                        # bid/ask/mid
-                        bid = ticker.bid if ticker.bid and not math.isnan(ticker.bid) and ticker.bid > 0 else None
-                        ask = ticker.ask if ticker.ask and not math.isnan(ticker.ask) and ticker.ask > 0 else None
-                        mid = (bid + ask) / 2 if bid and ask else None
-
-                        long_strike = strike - config.SPREAD_WIDTH
-                        max_profit = mid * 100 if mid else None
-                        max_loss = (config.SPREAD_WIDTH - mid) * 100 if (mid and mid < config.SPREAD_WIDTH) else None
-                        win_prob = (1 - abs_delta) if abs_delta is not None else None
-                        score = (win_prob * max_profit / max_loss) if (win_prob and max_profit and max_loss and max_loss > 0) else 0
-
-                        candidates.append({
-                            'short_strike': strike,
-                            'long_strike': long_strike,
-                            'expiry': exp_str,
-                            'exp_date': exp_date.strftime('%Y-%m-%d'),
-                            'dte': dte,
-                            'short_delta': abs_delta,
-                            'short_iv': iv,
-                            'spread_premium_mid': mid,
-                            'max_profit': max_profit,
-                            'max_loss': max_loss,
-                            'risk_reward_ratio': max_loss / max_profit if (max_profit and max_loss) else None,
-                            'win_probability': win_prob,
-                            'score': score,
-                        })
-
-                candidates.sort(key=lambda x: x['score'], reverse=True)
-                return candidates
+                # 5. 全期限（最大2期限）の契約をまとめて検証・購読し、1回だけ待機する
+                exp_info = {exp_str: (exp_date, dte) for exp_str, exp_date, dte in valid_expirations[:2]}
+                # 満期日・契約・Tickerはインデックスで対応する並列リストで保持する
+                # tradingClass='SPY'を指定してAmbiguous contractエラーを回避
+                expiries = [exp_str for exp_str in exp_info for _ in target_strikes]
+                contracts = [
+                    Option('SPY', exp_str, strike, 'P', 'SMART', tradingClass='SPY')
+                    for exp_str in exp_info
+                    for strike in target_strikes
+                ]
+
+                # 契約を検証
+                try:
+                    ib.qualifyContracts(*contracts)
+                except Exception as qe:
+                    logger.warning(f'qualifyContracts failed: {qe}')
+                    return []
+
+                valid = [i for i, c in enumerate(contracts) if c.conId]
+                if not valid:
+                    return []
+                expiries = [expiries[i] for i in valid]
+                contracts = [contracts[i] for i in valid]
+
+                # マーケットデータをリクエスト（Greeksを含む）
+                tickers = [ib.reqMktData(c, '100,101,105,106', False, False) for c in contracts]
+
+                # 全契約のGreeksとbid/askが届いた時点で待機終了（最大5秒）
+                wait_for_tickers(ib, tickers, _option_ticker_ready, timeout=5)
+
+                for c in contracts:
+                    ib.cancelMktData(c)
+
+                # 6. 各フィールドを配列に詰めてからまとめて指標を計算
+                # デルタを取得（modelGreeks > bidGreeks > lastGreeks の順）
+                n = len(tickers)
+                greeks = [t.modelGreeks or t.bidGreeks or t.lastGreeks for t in tickers]
+                strikes = np.fromiter((c.strike for c in contracts), float, n)
+                deltas = np.fromiter(
+                    (g.delta if g and g.delta is not None else np.nan for g in greeks), float, n
+                )
+                ivs = np.fromiter(
+                    (g.impliedVol if g and g.impliedVol is not None else np.nan for g in greeks), float, n
+                )
+                bids = np.fromiter((t.bid for t in tickers), float, n)
+                asks = np.fromiter((t.ask for t in tickers), float, n)
+
+                return _score_candidates(expiries, strikes, exp_info, deltas, ivs, bids, asks)
 
             # タイムアウトを60秒に延長（複数期限のデータ取得に時間がかかるため）
-            candidates = await service.execute_timeout(60, _fetch_spread_candidates, service.ib)
+            spy_contract, chains, strikes_by_chain = await _get_option_chains(service, 'SPY')
+            async with service.acquire() as ib:
+                candidates = await service.execute_timeout(
+                    60, _fetch_spread_candidates, ib, spy_contract, chains, strikes_by_chain
+                )
 
-            return {
+            return ORJSONResponse({
                 "candidates_count": len(candidates),
                 "candidates": candidates
-            }
+            })
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to get spread candidates: {str(e)}")
 
 
-@router.post("/options/calculate-spread")
-async def calculate_spread_metrics(
-    short_strike: float,
-    long_strike: float,
-    short_premium: float,
+class SpreadInput(BaseModel):
+    """スプレッド指標計算リクエスト"""
+    short_strike: float
+    long_strike: float
+    short_premium: float
     long_premium: float
-):
+
+
+@router.post("/options/calculate-spread")
+async def calculate_spread_metrics(body: SpreadInput):
     """
     スプレッド指標を計算
 
     Args:
-        short_strike: ショートストライク
-        long_strike: ロングストライク
-        short_premium: ショートプレミアム
-        long_premium: ロングプレミアム
+        body: ショート/ロングのストライクとプレミアム
 
     Returns:
         dict: スプレッド指標
     """
-    try:
-        spread_width = short_strike - long_strike
-        net_premium = short_premium - long_premium
-        max_loss = spread_width - net_premium
-        max_profit = net_premium
-        breakeven = short_strike - net_premium
-        risk_reward_ratio = max_loss / max_profit if max_profit > 0 else 0
-        pop = (max_profit / spread_width) * 100 if spread_width > 0 else 0
-
-        return {
-            "spread_width": spread_width,
-            "net_premium": net_premium,
-            "max_loss": max_loss,
-            "max_profit": max_profit,
-            "breakeven": breakeven,
-            "risk_reward_ratio": risk_reward_ratio,
-            "probability_of_profit": pop
-        }
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to calculate spread: {str(e)}")
+    spread_width = body.short_strike - body.long_strike
+    net_premium = body.short_premium - body.long_premium
+    max_loss = spread_width - net_premium
+    max_profit = net_premium
+    breakeven = body.short_strike - net_premium
+    risk_reward_ratio = max_loss / max_profit if max_profit > 0 else 0
+    pop = (max_profit / spread_width) * 100 if spread_width > 0 else 0
+
+    return {
+        "spread_width": spread_width,
+        "net_premium": net_premium,
+        "max_loss": max_loss,
+        "max_profit": max_profit,
+        "breakeven": breakeven,
+        "risk_reward_ratio": risk_reward_ratio,
+        "probability_of_profit": pop
+    }
@@ -2,16 +2,78 @@
 ポジションAPIルーター
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import Optional
-import sys
-import os
+from typing import Callable, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import time
+import pytz
+
+from services.position_service import PositionService
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 router = APIRouter()
 
+POSITIONS_CACHE_TTL = 1.5  # 秒
+# キャッシュするstatusフィルター（それ以外の値は毎回取得し、キャッシュのキーを増やさない）
+_CACHED_STATUSES = (None, 'open', 'closed', 'expired')
+
+
+class _PositionsCache:
+    """
+    ステータス別のポジション一覧レスポンスの短期キャッシュ
+
+    ダッシュボードのポーリングが集中しても、TTL内は前回の結果を返す。
+    ポジションを更新したら clear() で破棄する。
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Optional[str], Tuple[float, dict]] = {}
+
+    def get(self, status: Optional[str], fetch: Callable[[], dict]) -> dict:
+        """
+        キャッシュ済みの結果を返す（期限切れなら fetch() で作り直す）
+
+        fetch() は同期関数でイベントループを手放さないため、同時リクエストが
+        重なっても作り直しは1回だけになる。
+
+        Args:
+            status: フィルター（キャッシュキー）
+            fetch: レスポンスを作る関数
+
+        Returns:
+            dict: レスポンス
+        """
+        now = time.monotonic()
+        entry = self._entries.get(status)
+        if entry and now < entry[0]:
+            return entry[1]
+
+        payload = fetch()
+        self._entries[status] = (now + self.ttl, payload)
+        return payload
+
+    def clear(self):
+        self._entries.clear()
+
+
+_positions_cache = _PositionsCache(POSITIONS_CACHE_TTL)
+
+
+async def get_position_service(request: Request) -> PositionService:
+    """
+    起動時に生成したPositionServiceを返す（FastAPIのDepends用）
+
+    async defにしてスレッドプールを経由せずに解決させる。
+    """
+    position_service = request.app.state.position_service
+    if not position_service:
+        raise HTTPException(status_code=503, detail="Position manager not available")
+    return position_service
+
 
 class ClosePositionRequest(BaseModel):
     """ポジションクローズリクエスト"""
@@ -20,7 +82,10 @@ class ClosePositionRequest(BaseModel):
 
 
 @router.get("/positions")
-async def get_positions(status: Optional[str] = None):
+async def get_positions(
+    status: Optional[str] = None,
+    position_service: PositionService = Depends(get_position_service)
+):
     """
     ポジション一覧を取得
 
@@ -30,35 +95,25 @@ async def get_positions(status: Optional[str] = None):
     Returns:
         list: ポジションのリスト
     """
-    from main import app_state
-
-    position_manager = app_state.get('position_manager')
-    if not position_manager:
-        raise HTTPException(status_code=503, detail="Position manager not available")
-
     try:
-        from services.position_service import PositionService
-
-        position_service = PositionService(position_manager)
-
-        if status == 'open':
-            positions = position_service.get_open_positions()
-        else:
-            positions = position_service.get_all_positions()
-            if status:
-                positions = [p for p in positions if p['status'] == status]
-
-        return {
-            "positions_count": len(positions),
-            "positions": positions
-        }
+        def _fetch() -> dict:
+            positions = position_service.get_positions(status)
+            return {
+                "positions_count": len(positions),
+                "positions": positions
+            }
+
+        status = status or None
+        if status in _CACHED_STATUSES:
+            return ORJSONResponse(_positions_cache.get(status, _fetch))
+        return ORJSONResponse(_fetch())
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get positions: {str(e)}")
 
 
 @router.get("/positions/{spread_id}")
-async def get_position_by_id(spread_id: str):
+async def get_position_by_id(spread_id: str, position_service: PositionService = Depends(get_position_service)):
     """
     特定のポジションを取得
 
@@ -68,16 +123,7 @@ async def get_position_by_id(spread_id: str):
     Returns:
         dict: ポジション情報
     """
-    from main import app_state
-
-    position_manager = app_state.get('position_manager')
-    if not position_manager:
-        raise HTTPException(status_code=503, detail="Position manager not available")
-
     try:
-        from services.position_service import PositionService
-
-        position_service = PositionService(position_manager)
         position = position_service.get_position_by_id(spread_id)
 
         if not position:
@@ -92,7 +138,11 @@ async def get_position_by_id(spread_id: str):
 
 
 @router.post("/positions/{spread_id}/close")
-async def close_position(spread_id: str, request: ClosePositionRequest):
+async def close_position(
+    spread_id: str,
+    request: ClosePositionRequest,
+    position_service: PositionService = Depends(get_position_service)
+):
     """
     ポジションをクローズ
 
@@ -103,37 +153,25 @@ async def close_position(spread_id: str, request: ClosePositionRequest):
     Returns:
         dict: 結果
     """
-    from main import app_state
-
-    position_manager = app_state.get('position_manager')
-    if not position_manager:
-        raise HTTPException(status_code=503, detail="Position manager not available")
-
     try:
-        from services.position_service import PositionService
-
-        position_service = PositionService(position_manager)
-
-        # ポジションが存在するか確認
-        position = position_service.get_position_by_id(spread_id)
-        if not position:
-            raise HTTPException(status_code=404, detail=f"Position {spread_id} not found")
-
-        if position['status'] != 'open':
-            raise HTTPException(status_code=400, detail=f"Position {spread_id} is not open")
-
-        # ポジションをクローズ
-        success = position_service.close_position(
+        # ポジションをクローズ（positions.jsonへの書き込みを伴うため別スレッドで実行）
+        updated_position = await asyncio.to_thread(
+            position_service.close_position,
             spread_id=spread_id,
             exit_premium=request.exit_premium,
             fx_rate=request.fx_rate
         )
 
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to close position")
+        _positions_cache.clear()
 
-        # 更新されたポジションを取得
-        updated_position = position_service.get_position_by_id(spread_id)
+        if updated_position is None:
+            # 失敗時のみ理由を確認してステータスコードを決める
+            position = position_service.get_position_by_id(spread_id)
+            if not position:
+                raise HTTPException(status_code=404, detail=f"Position {spread_id} not found")
+            if position['status'] != 'open':
+                raise HTTPException(status_code=400, detail=f"Position {spread_id} is not open")
+            raise HTTPException(status_code=500, detail="Failed to close position")
 
         return {
             "message": "Position closed successfully",
@@ -147,7 +185,11 @@ async def close_position(spread_id: str, request: ClosePositionRequest):
 
 
 @router.get("/positions/{spread_id}/unrealized-pnl")
-async def get_unrealized_pnl(spread_id: str, current_premium: float):
+async def get_unrealized_pnl(
+    spread_id: str,
+    current_premium: float,
+    position_service: PositionService = Depends(get_position_service)
+):
     """
     未実現損益を計算
 
@@ -158,16 +200,7 @@ async def get_unrealized_pnl(spread_id: str, current_premium: float):
     Returns:
         dict: 未実現損益
     """
-    from main import app_state
-
-    position_manager = app_state.get('position_manager')
-    if not position_manager:
-        raise HTTPException(status_code=503, detail="Position manager not available")
-
     try:
-        from services.position_service import PositionService
-
-        position_service = PositionService(position_manager)
         pnl = position_service.calculate_unrealized_pnl(spread_id, current_premium)
 
         if pnl is None:
@@ -196,9 +229,6 @@ async def get_pnl_history(range: str = 'week'):
     Returns:
         dict: P&L履歴データ
     """
-    from datetime import datetime, timedelta
-    import pytz
-
     # モックデータを返す（実装時はDBから取得）
     now = datetime.now(pytz.UTC)
 
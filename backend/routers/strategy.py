@@ -3,17 +3,44 @@
 エントリー判断、自動発注制御
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from datetime import datetime
+import hashlib
+import orjson
 
+import config
 from backend.models.schemas import EntryPreview, StrategyStatus
-from backend.services.strategy_service import evaluate_entry
+from backend.services.auto_trader import get_auto_trader_status, run_auto_entry
+from backend.services.strategy_service import evaluate_entry, get_adjusted_delta
+from routers._fmt import hm, ymd
 
 router = APIRouter()
 
+# イベントカレンダーは設定ファイルの静的データなので、起動時にJSONとETagを作っておく
+_CAL_BODY = orjson.dumps({
+    'events': config.ECONOMIC_EVENTS,
+    'year': 2026
+})
+_CAL_ETAG = '"' + hashlib.blake2b(_CAL_BODY, digest_size=8).hexdigest() + '"'
+_CAL_HEADERS = {'ETag': _CAL_ETAG, 'Cache-Control': 'public, max-age=3600'}
+
+# 戦略ステータスの既定値。リクエストごとに変わる項目だけ model_copy で差し替える（再検証なし）
+_BASE_STATUS = StrategyStatus(
+    is_active=False,
+    next_entry_date=None,
+    next_entry_time=None,
+    current_vix=None,
+    adjusted_delta=None,
+    position_size_factor=1.0,
+    fear_greed_score=None,
+    fear_greed_rating=None,
+    open_positions_count=0,
+    skip_reason=None
+)
+
 
 @router.get("/strategy/next-entry", response_model=EntryPreview)
-async def get_next_entry_preview():
+async def get_next_entry_preview(request: Request):
     """
     次回エントリーのプレビュー（発注はしない）
 
@@ -24,14 +51,10 @@ async def get_next_entry_preview():
         EntryPreview: エントリー推奨情報
     """
     try:
-        # app_stateから必要なサービスインスタンスを取得
-        from main import app_state
-        import config
-
         if config.USE_MOCK_DATA:
             # モックモード
-            conn = app_state.get('ibkr_connection')
-            market_data_manager = app_state.get('market_data_manager')
+            conn = request.app.state.ibkr_connection
+            market_data_manager = request.app.state.market_data_manager
 
             if not conn:
                 raise HTTPException(
@@ -44,7 +67,7 @@ async def get_next_entry_preview():
 
         else:
             # リアルモード
-            service = app_state.get('ibkr_service')
+            service = request.app.state.ibkr_service
 
             if not service or not service.is_connected:
                 raise HTTPException(
@@ -65,7 +88,7 @@ async def get_next_entry_preview():
 
 
 @router.get("/strategy/status", response_model=StrategyStatus)
-async def get_strategy_status():
+async def get_strategy_status(request: Request):
     """
     現在の戦略ステータスを取得（スケジューラー状態を含む）
 
@@ -73,11 +96,6 @@ async def get_strategy_status():
         StrategyStatus: 自動発注の現在の状態
     """
     try:
-        from backend.services.auto_trader import get_auto_trader_status
-        from backend.services.strategy_service import get_adjusted_delta
-        from main import app_state, scheduler
-        import config
-
         auto_state = get_auto_trader_status()
 
         # VIX取得（利用可能な場合）
@@ -86,7 +104,7 @@ async def get_strategy_status():
         position_size_factor = 1.0
 
         if not config.USE_MOCK_DATA:
-            service = app_state.get('ibkr_service')
+            service = request.app.state.ibkr_service
             if service and service.is_connected:
                 # ストリーミングデータからVIXを取得（実装されていれば）
                 # 現時点では None のまま（VIXはオンデマンド取得）
@@ -95,28 +113,28 @@ async def get_strategy_status():
         if current_vix:
             adjusted_delta, position_size_factor = get_adjusted_delta(current_vix)
 
-        # 次回実行時刻（APSchedulerから取得）
-        next_run_time = auto_state.get('next_run_time')
+        # 次回実行時刻（APSchedulerのdatetimeをそのまま使い、なければ保存済みの文字列をパース）
+        next_run_dt = None
+        scheduler = request.app.state.scheduler
         if scheduler.running:
             job = scheduler.get_job('auto_entry')
-            if job and job.next_run_time:
-                next_run_time = job.next_run_time.isoformat()
+            if job:
+                next_run_dt = job.next_run_time
+        if next_run_dt is None and auto_state.get('next_run_time'):
+            try:
+                next_run_dt = datetime.fromisoformat(auto_state['next_run_time'])
+            except (TypeError, ValueError):
+                pass
 
-        # 次回エントリー日時をパース
         next_entry_date = None
         next_entry_time = None
-        if next_run_time:
-            try:
-                import pytz
-                dt = datetime.fromisoformat(next_run_time)
-                next_entry_date = dt.strftime('%Y-%m-%d')
-                next_entry_time = dt.strftime('%H:%M')
-            except Exception:
-                pass
+        if next_run_dt:
+            next_entry_date = ymd(next_run_dt)
+            next_entry_time = hm(next_run_dt)
 
         # オープンポジション数
         open_positions_count = 0
-        position_manager = app_state.get('position_manager')
+        position_manager = request.app.state.position_manager
         if position_manager:
             try:
                 positions = position_manager.get_open_positions()
@@ -124,18 +142,16 @@ async def get_strategy_status():
             except Exception:
                 pass
 
-        status = StrategyStatus(
-            is_active=auto_state.get('is_active', False),
-            next_entry_date=next_entry_date,
-            next_entry_time=next_entry_time,
-            current_vix=current_vix,
-            adjusted_delta=adjusted_delta,
-            position_size_factor=position_size_factor,
-            fear_greed_score=None,
-            fear_greed_rating=None,
-            open_positions_count=open_positions_count,
-            skip_reason=auto_state.get('last_error')
-        )
+        status = _BASE_STATUS.model_copy(update={
+            'is_active': bool(auto_state.get('is_active', False)),
+            'next_entry_date': next_entry_date,
+            'next_entry_time': next_entry_time,
+            'current_vix': current_vix,
+            'adjusted_delta': adjusted_delta,
+            'position_size_factor': position_size_factor,
+            'open_positions_count': open_positions_count,
+            'skip_reason': auto_state.get('last_error')
+        })
 
         return status
 
@@ -147,25 +163,21 @@ async def get_strategy_status():
 
 
 @router.post("/strategy/execute-now")
-async def execute_entry_now():
+async def execute_entry_now(request: Request):
     """
     手動で今すぐエントリーを実行（テスト・緊急用）
 
     Returns:
         dict: 実行結果
     """
-    from main import app_state
-    import config
-
     if config.USE_MOCK_DATA:
         raise HTTPException(status_code=400, detail="モックモードでは手動実行できません")
 
-    service = app_state.get('ibkr_service')
+    service = request.app.state.ibkr_service
     if not service or not service.is_connected:
         raise HTTPException(status_code=503, detail="IBKR未接続")
 
     try:
-        from backend.services.auto_trader import run_auto_entry
         result = await run_auto_entry(service)
         return result
     except Exception as e:
@@ -173,19 +185,20 @@ async def execute_entry_now():
 
 
 @router.get("/strategy/event-calendar")
-async def get_event_calendar():
+async def get_event_calendar(request: Request):
     """
     イベントカレンダー一覧を取得
 
+    クライアントが同じETagを持っていれば本文なしの304を返す。
+
     Returns:
-        dict: イベントカレンダー
+        Response: イベントカレンダー（JSON）
     """
-    import sys
-    import os
-    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-    import config
-
-    return {
-        'events': config.ECONOMIC_EVENTS,
-        'year': 2026
-    }
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and (
+        if_none_match.strip() == '*'
+        or _CAL_ETAG in (tag.strip().removeprefix('W/') for tag in if_none_match.split(','))
+    ):
+        return Response(status_code=304, headers=_CAL_HEADERS)
+
+    return Response(content=_CAL_BODY, media_type='application/json', headers=_CAL_HEADERS)
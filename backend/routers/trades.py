@@ -2,35 +2,150 @@
 取引ログAPIルーター
 """
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from datetime import datetime, timedelta
-import pytz
-import io
+from functools import lru_cache
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
 import csv
 
+from routers._fmt import ymd, ymdhms
+
 router = APIRouter()
 
+# タイムゾーン（pytzより変換が速い標準ライブラリのzoneinfoを使用）
+_UTC = ZoneInfo('UTC')
+_JST = ZoneInfo('Asia/Tokyo')
+_ET = ZoneInfo('US/Eastern')
+
+# 取引ログCSVのヘッダー
+_TRADE_HEADER = (
+    '取引ID', '日時(JST)', '銘柄', 'アクション', 'タイプ',
+    'ストライク', '期限', '数量', 'プレミアム/契約', '総プレミアム(USD)',
+    '手数料(USD)', '純額(USD)', '為替レート', '純額(JPY)',
+    'スプレッドID', 'レグ', 'ステータス', '備考'
+)
+
+# 金額の書式（行ごとにf-stringを解釈せず、事前に束縛したformatを使う）
+_FMT_USD = '{:.2f}'.format
+_FMT_JPY = '{:.0f}'.format
+
+# モック取引データの列（各レグの値はこの順で並べる）
+_TRADE_FIELDS = (
+    'trade_id', 'timestamp_utc', 'timestamp_et', 'timestamp_jst', 'trade_date_jst',
+    'symbol', 'action', 'option_type', 'strike', 'expiry', 'quantity',
+    'premium_per_contract', 'total_premium_usd', 'commission_usd', 'net_amount_usd',
+    'fx_rate_usd_jpy', 'fx_rate_tts', 'net_amount_jpy',
+    'spread_id', 'leg', 'position_status', 'notes',
+)
+
+# モックスプレッド1件分のレグ
+# (ID接尾辞, 時刻, アクション, ストライク, プレミアム/契約, 総プレミアム, 純額USD,
+#  為替レート, TTS, 純額JPY, レグ, 備考)
+_MOCK_LEGS = (
+    # エントリー: Short Put
+    ('SHORT', 'entry', 'SELL', 580.0, 3.25, 650.0, 647.40,
+     155.0, 156.0, 100995, 'short', 'Bull Put Credit Spread - Short Leg'),
+    # エントリー: Long Put (保護)
+    ('LONG', 'entry', 'BUY', 575.0, 0.50, 100.0, -102.60,
+     155.0, 156.0, -16006, 'long', 'Bull Put Credit Spread - Long Leg (保護)'),
+    # エグジット: Buy to Close Short Put
+    ('CLOSE_SHORT', 'exit', 'BUY', 580.0, 0.50, 100.0, -102.60,
+     154.5, 155.5, -15954, 'short', 'ポジションクローズ - 利益確定'),
+    # エグジット: Sell to Close Long Put
+    ('CLOSE_LONG', 'exit', 'SELL', 575.0, 0.10, 20.0, 17.40,
+     154.5, 155.5, 2706, 'long', 'ポジションクローズ'),
+)
+
+# csv.writer.writerows() にまとめて渡す行数
+CSV_CHUNK_ROWS = 500
+
+
+class _LineBuffer:
+    """csv.writerの書き込み先。書き込まれた行を溜めておき、1行ずつ取り出す"""
+
+    def __init__(self):
+        self.buf = ''
+
+    def write(self, s: str):
+        self.buf += s
+
+
+async def _stream_csv(
+    rows: Iterable[Sequence],
+    header: Optional[Sequence] = None
+) -> AsyncIterator[str]:
+    """
+    行をCSVに変換しながら少しずつ返す（StreamingResponse用）
+
+    CSV全体をメモリに組み立てず、CSV_CHUNK_ROWS行ごとに writerows() で
+    まとめて書き出して送信する。
+
+    Args:
+        rows: CSVのデータ行
+        header: ヘッダー行（省略可）
+
+    Yields:
+        str: CSV形式の行のまとまり
+    """
+    buf = _LineBuffer()
+    writer = csv.writer(buf)
+    if header is not None:
+        writer.writerow(header)
+        yield buf.buf
+        buf.buf = ''
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CSV_CHUNK_ROWS))
+        if not chunk:
+            break
+        writer.writerows(chunk)
+        yield buf.buf
+        buf.buf = ''
+
+
+def _csv_response(content: AsyncIterator[str], filename: str) -> StreamingResponse:
+    """
+    CSVダウンロード用のStreamingResponseを作成
+
+    Args:
+        content: CSVの行を返すジェネレーター
+        filename: ダウンロード時のファイル名
+
+    Returns:
+        StreamingResponse: CSVレスポンス
+    """
+    return StreamingResponse(
+        content,
+        media_type="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+            "X-Content-Type-Options": "nosniff",
+        }
+    )
+
 
 @router.get("/trades")
-async def get_trades():
+async def get_trades(request: Request):
     """
     取引ログを取得
 
     Returns:
         dict: 取引ログのリスト
     """
-    from main import app_state
-
-    position_manager = app_state.get('position_manager')
+    position_manager = request.app.state.position_manager
     if not position_manager:
         # ポジションマネージャーがない場合はモックデータを返す
-        return _get_mock_trades()
+        return ORJSONResponse(_get_mock_trades())
 
     try:
         # 実際の実装ではposition_managerから取引履歴を取得
         # 現時点ではモックデータを返す
-        return _get_mock_trades()
+        return ORJSONResponse(_get_mock_trades())
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get trades: {str(e)}")
@@ -45,53 +160,10 @@ async def export_trades_csv():
         StreamingResponse: CSVファイル
     """
     try:
-        trades_data = _get_mock_trades()
-        trades = trades_data.get('trades', [])
-
-        # CSVデータを生成
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # ヘッダー
-        writer.writerow([
-            '取引ID', '日時(JST)', '銘柄', 'アクション', 'タイプ',
-            'ストライク', '期限', '数量', 'プレミアム/契約', '総プレミアム(USD)',
-            '手数料(USD)', '純額(USD)', '為替レート', '純額(JPY)',
-            'スプレッドID', 'レグ', 'ステータス', '備考'
-        ])
-
-        # データ行
-        for trade in trades:
-            writer.writerow([
-                trade['trade_id'],
-                trade['timestamp_jst'],
-                trade['symbol'],
-                trade['action'],
-                trade['option_type'],
-                trade['strike'],
-                trade['expiry'],
-                trade['quantity'],
-                f"{trade['premium_per_contract']:.2f}",
-                f"{trade['total_premium_usd']:.2f}",
-                f"{trade['commission_usd']:.2f}",
-                f"{trade['net_amount_usd']:.2f}",
-                f"{trade['fx_rate_usd_jpy']:.2f}" if trade['fx_rate_usd_jpy'] else '',
-                f"{trade['net_amount_jpy']:.0f}" if trade['net_amount_jpy'] else '',
-                trade['spread_id'],
-                trade['leg'],
-                trade['position_status'],
-                trade['notes']
-            ])
-
-        output.seek(0)
-
-        # CSVレスポンスを返す
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename=trades_{datetime.now().strftime('%Y%m%d')}.csv"
-            }
+        # CSVレスポンスを返す（行ごとに生成して送信）
+        return _csv_response(
+            _stream_csv(_iter_mock_trade_rows_csv(_today_key()), header=_TRADE_HEADER),
+            f"trades_{datetime.now().strftime('%Y%m%d')}.csv"
         )
 
     except Exception as e:
@@ -113,19 +185,7 @@ async def get_tax_summary(year: int = None):
         year = datetime.now().year
 
     try:
-        # モックデータを返す（実際の実装ではDBから集計）
-        return {
-            "year": year,
-            "total_premium_received_usd": 1250.00,
-            "total_premium_paid_usd": 200.00,
-            "total_commission_usd": 50.00,
-            "net_profit_usd": 1000.00,
-            "net_profit_jpy": 155000,  # 155円換算
-            "total_trades": 24,
-            "win_count": 20,
-            "loss_count": 4,
-            "win_rate": 0.833
-        }
+        return _compute_tax_summary(year)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get tax summary: {str(e)}")
@@ -146,173 +206,179 @@ async def export_tax_csv(year: int = None):
         year = datetime.now().year
 
     try:
-        summary = await get_tax_summary(year)
-
-        # CSVデータを生成
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # ヘッダー（国税庁様式に準拠）
-        writer.writerow(['【雑所得】オプション取引損益計算書'])
-        writer.writerow([f'対象年: {year}年'])
-        writer.writerow([])
-
-        # サマリー
-        writer.writerow(['項目', '金額（USD）', '金額（JPY）'])
-        writer.writerow(['総受取プレミアム', f"{summary['total_premium_received_usd']:.2f}", ''])
-        writer.writerow(['総支払プレミアム', f"{summary['total_premium_paid_usd']:.2f}", ''])
-        writer.writerow(['総手数料', f"{summary['total_commission_usd']:.2f}", ''])
-        writer.writerow(['純利益（課税所得）', f"{summary['net_profit_usd']:.2f}", f"{summary['net_profit_jpy']:.0f}"])
-        writer.writerow([])
-
-        # 統計
-        writer.writerow(['統計情報', ''])
-        writer.writerow(['総取引数', summary['total_trades']])
-        writer.writerow(['利益取引数', summary['win_count']])
-        writer.writerow(['損失取引数', summary['loss_count']])
-        writer.writerow(['勝率', f"{summary['win_rate']*100:.1f}%"])
-        writer.writerow([])
-
-        # 注記
-        writer.writerow(['注記'])
-        writer.writerow(['※ 為替レートは各取引時のTTSレートを使用'])
-        writer.writerow(['※ 手数料は必要経費として計上可能'])
-        writer.writerow(['※ 詳細は税理士にご相談ください'])
-
-        output.seek(0)
+        summary = _compute_tax_summary(year)
 
         # CSVレスポンスを返す
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename=tax_report_{year}.csv"
-            }
-        )
+        return _csv_response(_stream_csv(_tax_csv_rows(year, summary)), f"tax_report_{year}.csv")
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export tax CSV: {str(e)}")
 
 
+def _compute_tax_summary(year: int) -> Dict:
+    """
+    税務サマリーを集計
+
+    Args:
+        year: 対象年
+
+    Returns:
+        dict: 税務サマリー
+    """
+    # モックデータを返す（実際の実装ではDBから集計）
+    return {
+        "year": year,
+        "total_premium_received_usd": 1250.00,
+        "total_premium_paid_usd": 200.00,
+        "total_commission_usd": 50.00,
+        "net_profit_usd": 1000.00,
+        "net_profit_jpy": 155000,  # 155円換算
+        "total_trades": 24,
+        "win_count": 20,
+        "loss_count": 4,
+        "win_rate": 0.833
+    }
+
+
+def _tax_csv_rows(year: int, summary: Dict) -> Iterator[list]:
+    """税務申告用CSVの行を生成"""
+    # ヘッダー（国税庁様式に準拠）
+    yield ['【雑所得】オプション取引損益計算書']
+    yield [f'対象年: {year}年']
+    yield []
+
+    # サマリー
+    yield ['項目', '金額（USD）', '金額（JPY）']
+    yield ['総受取プレミアム', f"{summary['total_premium_received_usd']:.2f}", '']
+    yield ['総支払プレミアム', f"{summary['total_premium_paid_usd']:.2f}", '']
+    yield ['総手数料', f"{summary['total_commission_usd']:.2f}", '']
+    yield ['純利益（課税所得）', f"{summary['net_profit_usd']:.2f}", f"{summary['net_profit_jpy']:.0f}"]
+    yield []
+
+    # 統計
+    yield ['統計情報', '']
+    yield ['総取引数', summary['total_trades']]
+    yield ['利益取引数', summary['win_count']]
+    yield ['損失取引数', summary['loss_count']]
+    yield ['勝率', f"{summary['win_rate']*100:.1f}%"]
+    yield []
+
+    # 注記
+    yield ['注記']
+    yield ['※ 為替レートは各取引時のTTSレートを使用']
+    yield ['※ 手数料は必要経費として計上可能']
+    yield ['※ 詳細は税理士にご相談ください']
+
+
 def _get_mock_trades():
     """モック取引データを生成"""
-    now = datetime.now(pytz.UTC)
-    jst = pytz.timezone('Asia/Tokyo')
-    et = pytz.timezone('US/Eastern')
+    trades = list(_today_mock_trades())
+    return {
+        'trades': trades,
+        'total_count': len(trades)
+    }
+
+
+def _today_key() -> str:
+    """モックデータの日付キー（YYYYMMDD、UTC）"""
+    return datetime.now(_UTC).strftime('%Y%m%d')
+
 
-    trades = []
+def _today_mock_trades() -> Tuple[Dict, ...]:
+    """当日分のモック取引データ（日付が変わるまで同じデータを返す）"""
+    return _mock_trades_for(_today_key())
+
+
+@lru_cache(maxsize=4)
+def _mock_trades_for(day_key: str) -> Tuple[Dict, ...]:
+    """
+    日付ごとのモック取引データ
+
+    キャッシュした辞書を共有するため、呼び出し側は読み取り専用として扱うこと。
+
+    Args:
+        day_key: 日付キー（YYYYMMDD、UTC）
+
+    Returns:
+        tuple: 取引データ
+    """
+    return tuple(_iter_mock_trades_json(day_key))
+
+
+@lru_cache(maxsize=4)
+def _mock_spreads_for(day_key: str) -> Tuple[tuple, ...]:
+    """
+    日付ごとのモックスプレッド（JSON・CSV共通の骨組み）
+
+    各時刻（UTC, ET, JST, JST日付）はここで一度だけ文字列にし、同じ時刻のレグで使い回す。
+
+    Args:
+        day_key: 日付キー（YYYYMMDD、UTC）
+
+    Returns:
+        tuple: (インデックス, スプレッドID, {'entry'/'exit': 時刻文字列}, 満期日) のタプル
+    """
+    now = datetime.now(_UTC)
 
     # モックデータ: 最近の2つのスプレッド取引
+    spreads = []
     for i in range(2):
         spread_id = f"SPREAD_{(now - timedelta(days=i*7)).strftime('%Y%m%d_%H%M%S')}"
         entry_time = now - timedelta(days=i*7, hours=10)
         exit_time = now - timedelta(days=i*7-3, hours=14)
 
-        # エントリー: Short Put
-        trades.append({
-            'trade_id': f"{spread_id}_SHORT",
-            'timestamp_utc': entry_time.isoformat(),
-            'timestamp_et': entry_time.astimezone(et).strftime('%Y-%m-%d %H:%M:%S %Z'),
-            'timestamp_jst': entry_time.astimezone(jst).strftime('%Y-%m-%d %H:%M:%S'),
-            'trade_date_jst': entry_time.astimezone(jst).strftime('%Y-%m-%d'),
-            'symbol': 'SPY',
-            'action': 'SELL',
-            'option_type': 'PUT',
-            'strike': 580.0 - i*5,
-            'expiry': (entry_time + timedelta(days=5)).strftime('%Y-%m-%d'),
-            'quantity': 2,
-            'premium_per_contract': 3.25,
-            'total_premium_usd': 650.0,
-            'commission_usd': 2.60,
-            'net_amount_usd': 647.40,
-            'fx_rate_usd_jpy': 155.0,
-            'fx_rate_tts': 156.0,
-            'net_amount_jpy': 100995,
-            'spread_id': spread_id,
-            'leg': 'short',
-            'position_status': 'closed',
-            'notes': 'Bull Put Credit Spread - Short Leg'
-        })
-
-        # エントリー: Long Put (保護)
-        trades.append({
-            'trade_id': f"{spread_id}_LONG",
-            'timestamp_utc': entry_time.isoformat(),
-            'timestamp_et': entry_time.astimezone(et).strftime('%Y-%m-%d %H:%M:%S %Z'),
-            'timestamp_jst': entry_time.astimezone(jst).strftime('%Y-%m-%d %H:%M:%S'),
-            'trade_date_jst': entry_time.astimezone(jst).strftime('%Y-%m-%d'),
-            'symbol': 'SPY',
-            'action': 'BUY',
-            'option_type': 'PUT',
-            'strike': 575.0 - i*5,
-            'expiry': (entry_time + timedelta(days=5)).strftime('%Y-%m-%d'),
-            'quantity': 2,
-            'premium_per_contract': 0.50,
-            'total_premium_usd': 100.0,
-            'commission_usd': 2.60,
-            'net_amount_usd': -102.60,
-            'fx_rate_usd_jpy': 155.0,
-            'fx_rate_tts': 156.0,
-            'net_amount_jpy': -16006,
-            'spread_id': spread_id,
-            'leg': 'long',
-            'position_status': 'closed',
-            'notes': 'Bull Put Credit Spread - Long Leg (保護)'
-        })
-
-        # エグジット: Buy to Close Short Put
-        trades.append({
-            'trade_id': f"{spread_id}_CLOSE_SHORT",
-            'timestamp_utc': exit_time.isoformat(),
-            'timestamp_et': exit_time.astimezone(et).strftime('%Y-%m-%d %H:%M:%S %Z'),
-            'timestamp_jst': exit_time.astimezone(jst).strftime('%Y-%m-%d %H:%M:%S'),
-            'trade_date_jst': exit_time.astimezone(jst).strftime('%Y-%m-%d'),
-            'symbol': 'SPY',
-            'action': 'BUY',
-            'option_type': 'PUT',
-            'strike': 580.0 - i*5,
-            'expiry': (entry_time + timedelta(days=5)).strftime('%Y-%m-%d'),
-            'quantity': 2,
-            'premium_per_contract': 0.50,
-            'total_premium_usd': 100.0,
-            'commission_usd': 2.60,
-            'net_amount_usd': -102.60,
-            'fx_rate_usd_jpy': 154.5,
-            'fx_rate_tts': 155.5,
-            'net_amount_jpy': -15954,
-            'spread_id': spread_id,
-            'leg': 'short',
-            'position_status': 'closed',
-            'notes': 'ポジションクローズ - 利益確定'
-        })
-
-        # エグジット: Sell to Close Long Put
-        trades.append({
-            'trade_id': f"{spread_id}_CLOSE_LONG",
-            'timestamp_utc': exit_time.isoformat(),
-            'timestamp_et': exit_time.astimezone(et).strftime('%Y-%m-%d %H:%M:%S %Z'),
-            'timestamp_jst': exit_time.astimezone(jst).strftime('%Y-%m-%d %H:%M:%S'),
-            'trade_date_jst': exit_time.astimezone(jst).strftime('%Y-%m-%d'),
-            'symbol': 'SPY',
-            'action': 'SELL',
-            'option_type': 'PUT',
-            'strike': 575.0 - i*5,
-            'expiry': (entry_time + timedelta(days=5)).strftime('%Y-%m-%d'),
-            'quantity': 2,
-            'premium_per_contract': 0.10,
-            'total_premium_usd': 20.0,
-            'commission_usd': 2.60,
-            'net_amount_usd': 17.40,
-            'fx_rate_usd_jpy': 154.5,
-            'fx_rate_tts': 155.5,
-            'net_amount_jpy': 2706,
-            'spread_id': spread_id,
-            'leg': 'long',
-            'position_status': 'closed',
-            'notes': 'ポジションクローズ'
-        })
-
-    return {
-        'trades': trades,
-        'total_count': len(trades)
-    }
+        timestamps = {}
+        for when, dt in (('entry', entry_time), ('exit', exit_time)):
+            dt_et = dt.astimezone(_ET)
+            dt_jst = dt.astimezone(_JST)
+            timestamps[when] = (
+                dt.isoformat(),
+                f'{ymdhms(dt_et)} {dt_et.tzname()}',
+                ymdhms(dt_jst),
+                ymd(dt_jst),
+            )
+
+        spreads.append((i, spread_id, timestamps, ymd(entry_time + timedelta(days=5))))
+    return tuple(spreads)
+
+
+def _iter_mock_trades_json(day_key: str) -> Iterator[Dict]:
+    """/trades 用のモック取引データを1件ずつ生成"""
+    for i, spread_id, timestamps, expiry_str in _mock_spreads_for(day_key):
+        for (suffix, when, action, strike, premium, total_premium, net_usd,
+             fx_rate, fx_tts, net_jpy, leg, notes) in _MOCK_LEGS:
+            ts_utc, ts_et, ts_jst, date_jst = timestamps[when]
+            yield dict(zip(_TRADE_FIELDS, (
+                f"{spread_id}_{suffix}", ts_utc, ts_et, ts_jst, date_jst,
+                'SPY', action, 'PUT', strike - i*5, expiry_str, 2,
+                premium, total_premium, 2.60, net_usd,
+                fx_rate, fx_tts, net_jpy,
+                spread_id, leg, 'closed', notes,
+            )))
+
+
+def _iter_mock_trade_rows_csv(day_key: str) -> Iterator[tuple]:
+    """CSVエクスポート用のモック取引データ行を生成（列は_TRADE_HEADERと対応、辞書は作らない）"""
+    for i, spread_id, timestamps, expiry_str in _mock_spreads_for(day_key):
+        for (suffix, when, action, strike, premium, total_premium, net_usd,
+             fx_rate, _fx_tts, net_jpy, leg, notes) in _MOCK_LEGS:
+            yield (
+                f"{spread_id}_{suffix}",
+                timestamps[when][2],
+                'SPY',
+                action,
+                'PUT',
+                strike - i*5,
+                expiry_str,
+                2,
+                _FMT_USD(premium),
+                _FMT_USD(total_premium),
+                _FMT_USD(2.60),
+                _FMT_USD(net_usd),
+                _FMT_USD(fx_rate) if fx_rate else '',
+                _FMT_JPY(net_jpy) if net_jpy else '',
+                spread_id,
+                leg,
+                'closed',
+                notes
+            )
@@ -9,16 +9,48 @@
 5. Bull Put Spread 発注
 """
 
+import asyncio
+import heapq
 import logging
 import math
-from datetime import datetime
-from typing import Optional
-import pytz
+import time
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from statistics import NormalDist
+from typing import Optional, Tuple
+import numpy as np
+from ib_insync import Stock, Option, Index, LimitOrder, MarketOrder
 
 import config
+from position import PositionManager
+from backend.services.strategy_service import get_adjusted_delta
 
 logger = logging.getLogger(__name__)
 
+# qualifyContracts 1回あたりのコントラクト数上限（TWSのペーシング制限を避ける）
+QUALIFY_BATCH_SIZE = 45
+
+# この差より目標デルタに近い候補が見つかったら残りの満期は取得しない
+GOOD_ENOUGH_DELTA_DIFF = 0.02
+
+# 推定ストライク（Black-Scholes逆算）の前後何ドルまでを候補にするか
+STRIKE_WINDOW = 3.0
+
+# reqSecDefOptParams の結果（取得日, 取得時刻, チェーン）。満期・ストライクは日中ほぼ変わらない
+CHAIN_CACHE_TTL = 6 * 60 * 60  # 秒
+_chain_cache: Tuple[Optional[date], float, list] = (None, 0.0, [])
+
+# VIX・SPYの直近スナップショット（取得時刻, スナップショット）
+# 監視ジョブから買い増しエントリーへ続く場合などに、同じ値を取り直さない
+SNAPSHOT_TTL = 30  # 秒
+_snapshot: Tuple[float, Optional[dict]] = (0.0, None)
+
+# 検証済みの VIX/SPY コントラクト（conIdは変わらないため使い回す）
+_quote_contracts: list = []
+
+# ライブデータが得られない時（権限なし・時間外）に切り替えるマーケットデータ種別
+DELAYED_MARKET_DATA_TYPE = 3
+
 # グローバル状態（スケジューラー・UIから参照）
 _state = {
     'is_active': False,      # スケジューラー有効かどうか
@@ -42,6 +74,271 @@ def set_scheduler_active(active: bool, next_run: Optional[str] = None):
         _state['next_run_time'] = next_run
 
 
+def _finite(value) -> bool:
+    """IBKRのTicker値が有効か（None/NaNでない。NaNは自分自身と等しくならない）"""
+    return value is not None and value == value
+
+
+def _v(value) -> Optional[float]:
+    """IBKRのTicker値を正の値だけに正規化（None/NaN/0以下はNone）"""
+    return value if value and value == value and value > 0 else None
+
+
+def _has_any_quote(ticker) -> bool:
+    """価格系フィールドのいずれかが届いたか"""
+    return any(_finite(v) for v in (ticker.last, ticker.bid, ticker.ask, ticker.close))
+
+
+def _has_index_value(ticker) -> bool:
+    """VIX等のインデックス: last または close が届いたか"""
+    return _finite(ticker.last) or _finite(ticker.close)
+
+
+def _has_price(ticker) -> bool:
+    """株式: last または bid/ask が届いたか"""
+    return _finite(ticker.last) or (_finite(ticker.bid) and _finite(ticker.ask))
+
+
+def _has_quote(ticker) -> bool:
+    """
+    待機の終了条件: インデックスは last、それ以外は last か bid/ask が届いたか
+
+    インデックスの close は前日終値で先に届くことが多いため待機の終了条件にはせず、
+    タイムアウト後の代替値としてだけ使う（_has_index_value）。
+    """
+    if ticker.contract.secType == 'IND':
+        return _finite(ticker.last)
+    return _has_price(ticker)
+
+
+def _has_option_quote(ticker) -> bool:
+    """オプション: delta と正の bid/ask が揃ったか"""
+    greeks = ticker.modelGreeks or ticker.bidGreeks or ticker.lastGreeks
+    return (
+        greeks is not None and _finite(greeks.delta)
+        and _v(ticker.bid) is not None and _v(ticker.ask) is not None
+    )
+
+
+def _poll_until(ib, tickers: list, is_ready, timeout: float, label: str) -> bool:
+    """
+    全Tickerのデータが揃うまで待機し、待機時間をログに残す
+
+    固定時間の ib.sleep() と違い、揃った時点ですぐに戻る（最大 timeout 秒）。
+
+    Args:
+        ib: IB instance
+        tickers: 待機対象のTickerリスト
+        is_ready: Tickerのデータが揃ったかを判定する関数
+        timeout: 最大待機時間（秒）
+        label: ログ用の名前
+
+    Returns:
+        bool: timeout内に全Tickerが揃った場合True
+    """
+    # ibkr_service はインポート時にasyncioをパッチするため、IBKR接続時に呼ばれるここで読み込む
+    from backend.services.ibkr_service import wait_for_tickers
+
+    started = time.monotonic()
+    ready = wait_for_tickers(ib, tickers, is_ready, timeout)
+    elapsed = time.monotonic() - started
+    if ready:
+        logger.info(f'{label}: データ到着 {elapsed:.2f}s')
+    else:
+        logger.warning(f'{label}: {timeout:.0f}s以内に揃わず（{elapsed:.2f}s待機）')
+    return ready
+
+
+def _estimate_strike_for_delta(spot: float, dte: int, iv: float, target_delta: float) -> float:
+    """
+    目標デルタになるプットのストライクをBlack-Scholesの式から逆算する
+
+    プットのデルタ Δ = N(d1) - 1 より d1 = -N⁻¹(|Δ|)。
+    d1 = (ln(S/K) + σ²T/2) / (σ√T) を K について解く（金利・配当は無視）。
+
+    Args:
+        spot: 原資産価格
+        dte: 満期までの日数
+        iv: インプライドボラティリティ（年率、VIX/100 を代用）
+        target_delta: 目標デルタ（絶対値）
+
+    Returns:
+        float: 推定ストライク
+    """
+    t = max(dte, 1) / 365
+    sigma_sqrt_t = iv * math.sqrt(t)
+    return spot * math.exp(NormalDist().inv_cdf(target_delta) * sigma_sqrt_t + 0.5 * sigma_sqrt_t ** 2)
+
+
+def _get_chains_cached(ib, con_id: int) -> list:
+    """
+    SPYのオプションチェーン定義を取得（同じ日のうちは CHAIN_CACHE_TTL の間キャッシュ）
+
+    Args:
+        ib: IB instance
+        con_id: SPYのconId
+
+    Returns:
+        list: OptionChain のリスト
+    """
+    global _chain_cache
+
+    today = date.today()
+    cached_day, cached_at, chains = _chain_cache
+    if chains and cached_day == today and time.monotonic() - cached_at < CHAIN_CACHE_TTL:
+        return chains
+
+    chains = ib.reqSecDefOptParams('SPY', '', 'STK', con_id)
+    if chains:
+        _chain_cache = (today, time.monotonic(), chains)
+    return chains
+
+
+@lru_cache(maxsize=4096)
+def _spy_put(exp_str: str, strike: float):
+    """
+    SPYプットのコントラクト（満期・ストライクごとに同じオブジェクトを返す）
+
+    一度検証すればconIdが入ったまま使い回せるため、次回以降の検証を省略できる。
+
+    Args:
+        exp_str: 満期（YYYYMMDD）
+        strike: ストライク
+
+    Returns:
+        Option: コントラクト（未検証ならconIdは0）
+    """
+    return Option('SPY', exp_str, strike, 'P', 'SMART', tradingClass='SPY')
+
+
+def _qualify_missing(ib, contracts: list, label: str):
+    """
+    conId未設定のコントラクトだけを QUALIFY_BATCH_SIZE 件ずつ検証する
+
+    検証に失敗したコントラクトはconIdが0のまま残る。
+
+    Args:
+        ib: IB instance
+        contracts: コントラクトのリスト
+        label: ログ用の名前
+    """
+    # _spy_put() は同じオブジェクトを返すため、重複は1回だけ検証する
+    missing = list({id(c): c for c in contracts if not c.conId}.values())
+    for i in range(0, len(missing), QUALIFY_BATCH_SIZE):
+        batch = missing[i:i + QUALIFY_BATCH_SIZE]
+        try:
+            ib.qualifyContracts(*batch)
+        except Exception as qe:
+            logger.warning(f'{label}: qualifyContracts失敗 ({len(batch)}件): {qe}')
+
+
+def _cents(price: float) -> int:
+    """ドル価格をセント単位の整数に丸める（0.5セントは0から遠い方へ）"""
+    return int(price * 100 + 0.5) if price >= 0 else int(price * 100 - 0.5)
+
+
+def _option_mid(ticker) -> Optional[float]:
+    """オプションの現在値（bid/askの仲値、なければ last）"""
+    bid, ask = _v(ticker.bid), _v(ticker.ask)
+    if bid and ask:
+        return (bid + ask) / 2
+    return _v(ticker.last)
+
+
+def _req_market_data(ib, contracts: list, generic_ticks: str, is_ready, timeout: float, label: str) -> list:
+    """
+    マーケットデータを要求してデータ到着を待つ
+
+    価格が1つも届かなかった場合はライブデータの権限がないか時間外とみなし、
+    遅延データに切り替えて取り直す（接続の設定は元の種別に戻す）。
+
+    Args:
+        ib: IB instance
+        contracts: 検証済みのコントラクトリスト
+        generic_ticks: reqMktData の genericTickList
+        is_ready: Tickerのデータが揃ったかを判定する関数
+        timeout: 1回あたりの最大待機時間（秒）
+        label: ログ用の名前
+
+    Returns:
+        list: contracts と同じ順のTickerリスト（cancelMktData は呼び出し側で行う）
+    """
+    tickers = [ib.reqMktData(c, generic_ticks, False, False) for c in contracts]
+    _poll_until(ib, tickers, is_ready, timeout, label)
+
+    if config.MARKET_DATA_TYPE in (3, 4) or any(_has_any_quote(t) for t in tickers):
+        return tickers
+
+    logger.warning(f'{label}: ライブデータなし、遅延データで再取得')
+    for c in contracts:
+        ib.cancelMktData(c)
+    ib.reqMarketDataType(DELAYED_MARKET_DATA_TYPE)
+    try:
+        tickers = [ib.reqMktData(c, generic_ticks, False, False) for c in contracts]
+    finally:
+        ib.reqMarketDataType(config.MARKET_DATA_TYPE)
+    _poll_until(ib, tickers, is_ready, timeout, f'{label}（遅延）')
+    return tickers
+
+
+def _get_market_snapshot(ib) -> dict:
+    """
+    VIX・SPY価格を取得（SNAPSHOT_TTL 以内に取得済みならその結果を返す）
+
+    VIXとSPYは互いに依存しないため、まとめて購読して待機も1回にする。
+
+    Args:
+        ib: IB instance
+
+    Returns:
+        dict: vix, spy_price（取得失敗時はそれぞれNone）, spy_contract（検証済み、失敗時None）
+    """
+    global _snapshot, _quote_contracts
+
+    cached_at, snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - cached_at < SNAPSHOT_TTL:
+        return snapshot
+
+    quote_contracts = _quote_contracts
+    if not quote_contracts:
+        vix_contract = Index('VIX', 'CBOE')
+        spy_contract = Stock('SPY', 'SMART', 'USD')
+        try:
+            ib.qualifyContracts(vix_contract, spy_contract)
+        except Exception as e:
+            logger.warning(f'VIX/SPY contract検証失敗: {e}')
+        quote_contracts = [c for c in (vix_contract, spy_contract) if c.conId]
+        if len(quote_contracts) == 2:
+            _quote_contracts = quote_contracts
+
+    quote_tickers = _req_market_data(ib, quote_contracts, '', _has_quote, 2.0, 'VIX/SPY') if quote_contracts else []
+    for c in quote_contracts:
+        ib.cancelMktData(c)
+    quotes = {c.symbol: (c, t) for c, t in zip(quote_contracts, quote_tickers)}
+
+    vix = None
+    if 'VIX' in quotes:
+        _, t = quotes['VIX']
+        if _has_index_value(t):
+            vix = t.last if _finite(t.last) else t.close
+
+    spy_contract = None
+    spy_price = None
+    if 'SPY' in quotes:
+        spy_contract, t = quotes['SPY']
+        last, bid, ask = _v(t.last), _v(t.bid), _v(t.ask)
+        if last:
+            spy_price = last
+        elif bid and ask:
+            spy_price = (bid + ask) / 2
+
+    snapshot = {'vix': vix, 'spy_price': spy_price, 'spy_contract': spy_contract}
+    if spy_price:
+        # SPY価格が取れなかった結果はキャッシュせず、次の呼び出しで取り直す
+        _snapshot = (time.monotonic(), snapshot)
+    return snapshot
+
+
 def _execute_entry_sync(ib) -> dict:
     """
     IBKR worker thread内で実行される自動発注コア処理
@@ -52,9 +349,6 @@ def _execute_entry_sync(ib) -> dict:
     Returns:
         実行結果の辞書
     """
-    from ib_insync import Stock, Option, Index, LimitOrder
-    from backend.services.strategy_service import get_adjusted_delta
-
     result = {
         'success': False,
         'reason': None,
@@ -63,7 +357,7 @@ def _execute_entry_sync(ib) -> dict:
         'order_status': None,
         'vix': None,
         'adjusted_delta': None,
-        'timestamp': datetime.now(pytz.UTC).isoformat(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
     }
 
     # 1. 口座情報取得
@@ -80,24 +374,14 @@ def _execute_entry_sync(ib) -> dict:
 
     logger.info(f'NetLiquidation: ${net_liq:,.0f}')
 
-    # 2. VIX取得（失敗時はデフォルト値 18.5 を使用）
-    vix = 18.5
-    try:
-        vix_contract = Index('VIX', 'CBOE')
-        ib.qualifyContracts(vix_contract)
-        ib.reqMktData(vix_contract, '', False, False)
-        ib.sleep(2)
-        vix_ticker = ib.ticker(vix_contract)
-        ib.cancelMktData(vix_contract)
-
-        v_last = vix_ticker.last if vix_ticker.last and not math.isnan(vix_ticker.last) else None
-        v_close = vix_ticker.close if vix_ticker.close and not math.isnan(vix_ticker.close) else None
-        if v_last:
-            vix = v_last
-        elif v_close:
-            vix = v_close
-    except Exception as e:
-        logger.warning(f'VIX取得失敗（デフォルト {vix} を使用）: {e}')
+    # 2. VIX・SPY取得（直近のスナップショットがあれば再利用）
+    snapshot = _get_market_snapshot(ib)
+
+    # VIX（失敗時はデフォルト値 18.5 を使用）
+    vix = snapshot['vix']
+    if vix is None:
+        vix = 18.5
+        logger.warning(f'VIX取得失敗（デフォルト {vix} を使用）')
 
     result['vix'] = vix
     logger.info(f'VIX: {vix:.1f}')
@@ -111,20 +395,9 @@ def _execute_entry_sync(ib) -> dict:
     result['adjusted_delta'] = adjusted_delta
     logger.info(f'Target delta: {adjusted_delta:.2f}, size factor: {position_size_factor:.1f}')
 
-    # 4. SPY価格取得
-    spy_contract = Stock('SPY', 'SMART', 'USD')
-    ib.qualifyContracts(spy_contract)
-    ib.reqMktData(spy_contract, '', False, False)
-    ib.sleep(2)
-    spy_ticker = ib.ticker(spy_contract)
-    ib.cancelMktData(spy_contract)
-
-    spy_price = spy_ticker.last
-    if not spy_price or math.isnan(spy_price):
-        bid = spy_ticker.bid if spy_ticker.bid and not math.isnan(spy_ticker.bid) else None
-        ask = spy_ticker.ask if spy_ticker.ask and not math.isnan(spy_ticker.ask) else None
-        spy_price = (bid + ask) / 2 if bid and ask else None
-
+    # 4. SPY価格
+    spy_contract = snapshot['spy_contract']
+    spy_price = snapshot['spy_price']
     if not spy_price:
         result['reason'] = 'SPY価格取得失敗'
         return result
@@ -132,7 +405,7 @@ def _execute_entry_sync(ib) -> dict:
     logger.info(f'SPY price: ${spy_price:.2f}')
 
     # 5. オプションチェーン取得（最も満期が多いチェーンを選択）
-    chains = ib.reqSecDefOptParams('SPY', '', 'STK', spy_contract.conId)
+    chains = _get_chains_cached(ib, spy_contract.conId)
     if not chains:
         result['reason'] = 'オプションチェーン取得失敗'
         return result
@@ -140,12 +413,15 @@ def _execute_entry_sync(ib) -> dict:
     # SMART チェーンは近期オプションを含まないため、最大チェーンを使用
     chain = max(chains, key=lambda c: len(c.expirations))
 
-    today = datetime.now().date()
+    # 満期はYYYYMMDD固定なのでstrptimeを使わず数値で分解し、DTEは通日の差で求める
+    today_ord = datetime.now().date().toordinal()
     valid_expirations = []
     for exp_str in sorted(chain.expirations):
-        exp_date = datetime.strptime(exp_str, '%Y%m%d').date()
-        dte = (exp_date - today).days
-        if config.MIN_DTE <= dte <= config.MAX_DTE:
+        exp_date = date(int(exp_str[:4]), int(exp_str[4:6]), int(exp_str[6:8]))
+        dte = exp_date.toordinal() - today_ord
+        if dte > config.MAX_DTE:
+            break  # 昇順なので以降はすべて範囲外
+        if dte >= config.MIN_DTE:
             valid_expirations.append((exp_str, exp_date, dte))
 
     if not valid_expirations:
@@ -154,100 +430,125 @@ def _execute_entry_sync(ib) -> dict:
 
     logger.info(f'Valid expirations: {[(e[0], e[2]) for e in valid_expirations]}')
 
-    # 6. ATM近辺のストライクに絞る（SPY価格の85%〜100%）
-    target_strikes_all = sorted([
-        s for s in chain.strikes
-        if spy_price * 0.85 <= s < spy_price
-    ])
-    target_strikes = target_strikes_all[-15:] if len(target_strikes_all) > 15 else target_strikes_all
+    # 6. 目標デルタ近辺のストライクに絞る
+    #    VIXをIVの代わりにして各満期の推定ストライクを求め、その前後 STRIKE_WINDOW ドル
+    target_expirations = valid_expirations[:2]
+    estimates = [
+        _estimate_strike_for_delta(spy_price, dte, vix / 100, adjusted_delta)
+        for _, _, dte in target_expirations
+    ]
+    low = max(spy_price * 0.85, min(estimates) - STRIKE_WINDOW)
+    high = max(estimates) + STRIKE_WINDOW
+    target_strikes = sorted(s for s in chain.strikes if low <= s <= high and s < spy_price)
+    logger.info(f'Estimated strikes: {[round(k, 1) for k in estimates]} -> {target_strikes}')
+
+    if not target_strikes:
+        # 推定が外れた場合は従来どおりATM寄りの15ストライク（SPY価格の85%〜100%）
+        # 上位15件だけが必要なので全件ソートせず部分ヒープで取り出す（候補の並びは昇順に揃える）
+        target_strikes = sorted(heapq.nlargest(
+            15, (s for s in chain.strikes if spy_price * 0.85 <= s < spy_price)
+        ))
 
     if not target_strikes:
         result['reason'] = '対象ストライクなし'
         return result
 
-    candidates = []
-
-    # 7. 各満期のオプションデータ取得（最大2満期）
-    for exp_str, exp_date, dte in valid_expirations[:2]:
-        option_contracts = [
-            Option('SPY', exp_str, strike, 'P', 'SMART', tradingClass='SPY')
-            for strike in target_strikes
-        ]
-
-        try:
-            ib.qualifyContracts(*option_contracts)
-            option_contracts = [c for c in option_contracts if c.conId]
-        except Exception as qe:
-            logger.warning(f'qualifyContracts失敗 {exp_str}: {qe}')
-            continue
-
+    # 7. 対象満期（最大2満期）のコントラクトをまとめて検証し、満期ごとに振り分ける
+    #    （前回までに検証済みのコントラクトは再検証しない）
+    #    発注時に追加の検証が要らないよう、ロング側（ストライク - スプレッド幅）も同じ呼び出しで検証する
+    all_contracts = [
+        (exp_str, _spy_put(exp_str, strike))
+        for exp_str, _, _ in target_expirations
+        for strike in target_strikes
+    ]
+    long_legs = [
+        _spy_put(exp_str, strike - config.SPREAD_WIDTH)
+        for exp_str, _, _ in target_expirations
+        for strike in target_strikes
+    ]
+    _qualify_missing(ib, [c for _, c in all_contracts] + long_legs, 'オプション')
+    contracts_by_expiry = {exp_str: [] for exp_str, _, _ in target_expirations}
+    for exp_str, c in all_contracts:
+        if c.conId:
+            contracts_by_expiry[exp_str].append(c)
+
+    # 各満期のオプションデータ取得（スコア計算用に列ごとのリストへ集める）
+    cand_exp = []  # target_expirations のインデックス
+    cand_strikes = []
+    cand_deltas = []
+    cand_ivs = []
+    cand_bids = []
+    cand_asks = []
+    for exp_idx, (exp_str, _, _) in enumerate(target_expirations):
+        option_contracts = contracts_by_expiry.get(exp_str)
         if not option_contracts:
             continue
 
-        tickers_map = {}
-        for opt in option_contracts:
-            t = ib.reqMktData(opt, '100,101,105,106', False, False)
-            tickers_map[opt.strike] = (opt, t)
-
-        ib.sleep(5)  # データ到着を待つ
+        # 全ストライクの delta + bid/ask が揃った時点で待機終了（最大5秒）
+        option_tickers = _req_market_data(
+            ib, option_contracts, '100,101,105,106', _has_option_quote, 5.0,
+            f'オプション {exp_str}'
+        )
 
-        for strike, (opt, ticker) in tickers_map.items():
+        good_enough = False
+        for opt, ticker in zip(option_contracts, option_tickers):
             ib.cancelMktData(opt)
-            if not ticker:
-                continue
-
             greeks = ticker.modelGreeks or ticker.bidGreeks or ticker.lastGreeks
-            delta = None
-            iv = None
-            if greeks:
-                if greeks.delta is not None and not math.isnan(greeks.delta):
-                    delta = greeks.delta
-                if greeks.impliedVol is not None and not math.isnan(greeks.impliedVol):
-                    iv = greeks.impliedVol
-
-            abs_delta = abs(delta) if delta is not None else None
-
-            bid = ticker.bid if ticker.bid and not math.isnan(ticker.bid) and ticker.bid > 0 else None
-            ask = ticker.ask if ticker.ask and not math.isnan(ticker.ask) and ticker.ask > 0 else None
-            mid = (bid + ask) / 2 if bid and ask else None
-
-            # deltaとmidが揃っていないスプレッドは除外
-            if not mid or not abs_delta:
-                continue
-
-            long_strike = strike - config.SPREAD_WIDTH
-            max_profit = mid * 100
-            max_loss = (config.SPREAD_WIDTH - mid) * 100 if mid < config.SPREAD_WIDTH else None
-
-            if not max_loss or max_loss <= 0:
-                continue
+            delta = greeks.delta if greeks else None
+            cand_exp.append(exp_idx)
+            cand_strikes.append(opt.strike)
+            cand_deltas.append(delta)
+            cand_ivs.append(greeks.impliedVol if greeks else None)
+            cand_bids.append(ticker.bid)
+            cand_asks.append(ticker.ask)
+
+            if not good_enough and _finite(delta) and abs(abs(delta) - adjusted_delta) < GOOD_ENOUGH_DELTA_DIFF:
+                bid, ask = _v(ticker.bid), _v(ticker.ask)
+                good_enough = bool(bid and ask and (bid + ask) / 2 < config.SPREAD_WIDTH)
+
+        # 目標デルタに十分近い候補があれば、残りの満期は購読しない
+        if good_enough and exp_idx + 1 < len(target_expirations):
+            logger.info(f'{exp_str} で目標デルタ±{GOOD_ENOUGH_DELTA_DIFF}の候補あり、以降の満期はスキップ')
+            break
 
-            # 目標デルタへの近さでスコアリング（0.1以内ならフルスコア）
-            delta_diff = abs(abs_delta - adjusted_delta)
-            delta_score = max(0.0, 1.0 - delta_diff / 0.1)
-
-            candidates.append({
-                'short_strike': strike,
-                'long_strike': long_strike,
-                'expiry': exp_str,
-                'exp_date': exp_date.strftime('%Y-%m-%d'),
-                'dte': dte,
-                'short_delta': abs_delta,
-                'short_iv': iv,
-                'net_premium': mid,
-                'max_profit': max_profit,
-                'max_loss': max_loss,
-                'delta_score': delta_score,
-                'risk_reward_ratio': max_loss / max_profit if max_profit > 0 else None,
-            })
-
-    if not candidates:
+    # 8. 最適スプレッド選択（目標デルタに最も近いもの）をNumPyでまとめて計算
+    #    欠損（None/NaN）はNaNになり、比較がFalseになるため自動的に除外される
+    width = config.SPREAD_WIDTH
+    abs_delta = np.abs(np.array(cand_deltas, dtype=float))
+    bids = np.array(cand_bids, dtype=float)
+    asks = np.array(cand_asks, dtype=float)
+    with np.errstate(invalid='ignore'):
+        mid = (np.where(bids > 0, bids, np.nan) + np.where(asks > 0, asks, np.nan)) / 2
+        # deltaとmidが揃っていて、最大損失が正（mid < スプレッド幅）のものだけが候補
+        valid = (abs_delta > 0) & (mid > 0) & (mid < width)
+        # 目標デルタへの近さでスコアリング（0.1以内ならフルスコア）
+        delta_score = np.maximum(0.0, 1.0 - np.abs(abs_delta - adjusted_delta) / 0.1)
+
+    if not valid.any():
         result['reason'] = 'スプレッド候補なし（delta/midデータ不足）'
         return result
 
-    # 8. 最適スプレッド選択（目標デルタに最も近いもの）
-    candidates.sort(key=lambda x: x['delta_score'], reverse=True)
-    best = candidates[0]
+    # 同点は先頭（近い満期・低いストライク）を選ぶ
+    i = int(np.argmax(np.where(valid, delta_score, -1.0)))
+    exp_str, exp_date, dte = target_expirations[cand_exp[i]]
+    net_premium = float(mid[i])
+    max_profit = net_premium * 100
+    max_loss = (width - net_premium) * 100
+    short_iv = cand_ivs[i]
+    best = {
+        'short_strike': cand_strikes[i],
+        'long_strike': cand_strikes[i] - width,
+        'expiry': exp_str,
+        'exp_date': exp_date.isoformat(),
+        'dte': dte,
+        'short_delta': float(abs_delta[i]),
+        'short_iv': short_iv if _finite(short_iv) else None,
+        'net_premium': net_premium,
+        'max_profit': max_profit,
+        'max_loss': max_loss,
+        'delta_score': float(delta_score[i]),
+        'risk_reward_ratio': max_loss / max_profit,
+    }
 
     logger.info(
         f'Best spread: {best["short_strike"]}/{best["long_strike"]} '
@@ -261,23 +562,24 @@ def _execute_entry_sync(ib) -> dict:
     logger.info(f'Position size: {quantity} contracts, total max risk: ${best["max_loss"] * quantity:,.0f}')
 
     # 10. Bull Put Spread 発注
-    short_put = Option('SPY', best['expiry'], best['short_strike'], 'P', 'SMART', tradingClass='SPY')
-    long_put = Option('SPY', best['expiry'], best['long_strike'], 'P', 'SMART', tradingClass='SPY')
+    short_put = _spy_put(best['expiry'], best['short_strike'])
+    long_put = _spy_put(best['expiry'], best['long_strike'])
 
     try:
-        ib.qualifyContracts(short_put, long_put)
+        missing = [c for c in (short_put, long_put) if not c.conId]
+        if missing:
+            ib.qualifyContracts(*missing)
     except Exception as e:
         result['reason'] = f'発注コントラクト検証失敗: {e}'
         return result
 
-    # 指値: midpointから LIMIT_PRICE_OFFSET 有利に
-    net_premium = best['net_premium']
-    limit_price = round(net_premium - config.LIMIT_PRICE_OFFSET, 2)
+    # 指値: midpointから LIMIT_PRICE_OFFSET 有利に（セント単位の整数で計算）
+    limit_cents = _cents(best['net_premium'] - config.LIMIT_PRICE_OFFSET)
 
     # SELL put: 高めの指値で入りやすく
-    short_order = LimitOrder('SELL', quantity, round(limit_price + 0.05, 2), transmit=False)
+    short_order = LimitOrder('SELL', quantity, (limit_cents + 5) / 100, transmit=False)
     # BUY put: 低めの指値で入りやすく（両注文を同時送信）
-    long_order = LimitOrder('BUY', quantity, round(limit_price - 0.05, 2), transmit=True)
+    long_order = LimitOrder('BUY', quantity, (limit_cents - 5) / 100, transmit=True)
 
     short_trade = ib.placeOrder(short_put, short_order)
     long_trade = ib.placeOrder(long_put, long_order)
@@ -319,7 +621,7 @@ async def run_auto_entry(service) -> dict:
         return {'success': False, 'reason': 'IBKR未接続'}
 
     _state['is_running'] = True
-    _state['last_run_time'] = datetime.now(pytz.UTC).isoformat()
+    _state['last_run_time'] = datetime.now(timezone.utc).isoformat()
 
     try:
         logger.info('=' * 50)
@@ -368,9 +670,6 @@ def _monitor_positions_sync(ib) -> list:
     Returns:
         実行したアクションのリスト
     """
-    from ib_insync import Stock, Option, MarketOrder, LimitOrder
-    from position import PositionManager
-
     actions = []
     pm = PositionManager()
     open_positions = pm.get_open_positions()
@@ -381,63 +680,64 @@ def _monitor_positions_sync(ib) -> list:
 
     logger.info(f'ポジション監視: {len(open_positions)}件チェック')
 
-    # SPY価格を一度だけ取得
-    spy = Stock('SPY', 'SMART', 'USD')
-    ib.qualifyContracts(spy)
-    ib.reqMktData(spy, '', False, False)
-    ib.sleep(2)
-    spy_ticker = ib.ticker(spy)
-    ib.cancelMktData(spy)
-
-    spy_price = spy_ticker.last
-    if not spy_price or math.isnan(spy_price):
-        mid = (spy_ticker.bid + spy_ticker.ask) / 2 if (spy_ticker.bid and spy_ticker.ask) else None
-        spy_price = mid
-
+    # SPY価格を一度だけ取得（買い増しエントリーも同じスナップショットを使う）
+    spy_price = _get_market_snapshot(ib)['spy_price']
     if not spy_price:
         logger.warning('ポジション監視: SPY価格取得失敗、スキップ')
         return actions
 
     logger.info(f'ポジション監視: SPY ${spy_price:.2f}')
 
+    # 1. 全ポジションのレッグを集める（同じ満期・ストライクのコントラクトは1つにまとめる）
+    legs = {}       # spread_id -> (ショートのキー, ロングのキー)
+    contracts = {}  # (満期YYYYMMDD, ストライク) -> Option
     for spread_id, position in open_positions.items():
         try:
-            short_strike = float(position['short_strike'])
-            long_strike = float(position['long_strike'])
-            quantity = int(position['quantity'])
-            entry_premium = float(position['entry_premium'])
             # expiration フィールドは YYYYMMDD 形式（position.py の add_position 参照）
             expiration = position.get('expiration', position.get('expiry', ''))
             expiration = expiration.replace('-', '')  # YYYY-MM-DD → YYYYMMDD
+            keys = (
+                (expiration, float(position['short_strike'])),
+                (expiration, float(position['long_strike'])),
+            )
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            logger.error(f'{spread_id}: ポジションデータ不正、スキップ: {e}')
+            continue
+        for key in keys:
+            if key not in contracts:
+                contracts[key] = _spy_put(*key)
+        legs[spread_id] = keys
+
+    # 2. 全レッグをまとめて検証・購読し、価格の到着を1回だけ待つ
+    _qualify_missing(ib, list(contracts.values()), 'ポジション監視')
+
+    qualified = [(key, c) for key, c in contracts.items() if c.conId]
+    tickers = _req_market_data(
+        ib, [c for _, c in qualified], '', _has_price, 3.0, 'ポジション監視 オプション'
+    ) if qualified else []
+    for _, c in qualified:
+        ib.cancelMktData(c)
+    mids = {key: _option_mid(t) for (key, _), t in zip(qualified, tickers)}
+
+    # 3. ポジションごとに損切り・利確を判定し、決済注文を出す
+    pending_closes = []  # (action, trade_short, trade_long, spread_id, current_net_premium)
+    for spread_id, (short_key, long_key) in legs.items():
+        position = open_positions[spread_id]
+        try:
+            short_strike = short_key[1]
+            quantity = int(position['quantity'])
+            entry_premium = float(position['entry_premium'])
 
             stop_loss_threshold = entry_premium * config.STOP_LOSS_MULTIPLIER
 
-            # 現在のオプション価格を取得（ショート + ロング）
-            short_put = Option('SPY', expiration, short_strike, 'P', 'SMART', tradingClass='SPY')
-            long_put = Option('SPY', expiration, long_strike, 'P', 'SMART', tradingClass='SPY')
-
-            try:
-                ib.qualifyContracts(short_put, long_put)
-            except Exception as qe:
-                logger.warning(f'{spread_id}: contract検証失敗 ({qe}), スキップ')
+            if short_key not in mids or long_key not in mids:
+                logger.warning(f'{spread_id}: contract検証失敗, スキップ')
                 continue
 
-            short_ticker = ib.reqMktData(short_put, '', False, False)
-            long_ticker = ib.reqMktData(long_put, '', False, False)
-            ib.sleep(3)
-            ib.cancelMktData(short_put)
-            ib.cancelMktData(long_put)
-
-            def _mid(t):
-                bid = t.bid if t.bid and not math.isnan(t.bid) and t.bid > 0 else None
-                ask = t.ask if t.ask and not math.isnan(t.ask) and t.ask > 0 else None
-                last = t.last if t.last and not math.isnan(t.last) and t.last > 0 else None
-                if bid and ask:
-                    return (bid + ask) / 2
-                return last
-
-            short_mid = _mid(short_ticker)
-            long_mid = _mid(long_ticker)
+            short_put = contracts[short_key]
+            long_put = contracts[long_key]
+            short_mid = mids[short_key]
+            long_mid = mids[long_key]
 
             # 現在のネットプレミアム（Buy-to-close コスト）
             if short_mid and long_mid:
@@ -519,6 +819,8 @@ def _monitor_positions_sync(ib) -> list:
                             else:
                                 logger.warning(f'買い増し見送り: {add_result.get("reason")}')
                                 actions[-1]['add_entry_result'] = add_result
+                        except (ConnectionError, asyncio.TimeoutError):
+                            raise
                         except Exception as ae:
                             logger.error(f'買い増しエラー: {ae}')
                 continue
@@ -531,23 +833,16 @@ def _monitor_positions_sync(ib) -> list:
             else:  # PROFIT_TAKE
                 log_prefix = '✅ 利確発動'
                 # 利確は指値（mid近辺で買い戻し）
-                close_price = round(current_net_premium + 0.02, 2)
+                close_price = (_cents(current_net_premium) + 2) / 100
                 close_short = LimitOrder('BUY', quantity, close_price, transmit=False)
-                close_long = LimitOrder('SELL', quantity, round(long_mid - 0.02, 2) if long_mid else close_price, transmit=True)
+                close_long = LimitOrder('SELL', quantity, (_cents(long_mid) - 2) / 100 if long_mid else close_price, transmit=True)
 
             logger.warning(f'{log_prefix}: {spread_id} | 理由: {reason}')
 
             trade_short = ib.placeOrder(short_put, close_short)
             trade_long = ib.placeOrder(long_put, close_long)
-            ib.sleep(5)
-
-            short_close_status = trade_short.orderStatus.status if trade_short else 'Unknown'
-            long_close_status = trade_long.orderStatus.status if trade_long else 'Unknown'
 
-            close_ok = short_close_status in ('Submitted', 'Filled', 'PreSubmitted') and \
-                       long_close_status in ('Submitted', 'Filled', 'PreSubmitted')
-
-            actions.append({
+            action = {
                 'spread_id': spread_id,
                 'action': close_action,
                 'reason': reason,
@@ -555,23 +850,45 @@ def _monitor_positions_sync(ib) -> list:
                 'current_net_premium': current_net_premium,
                 'entry_premium': entry_premium,
                 'spy_price': spy_price,
-                'close_order_ok': close_ok,
-                'order_status': f'Short: {short_close_status}, Long: {long_close_status}',
-            })
-
-            if close_ok:
-                # PositionManager にクローズを記録
-                try:
-                    pm.close_position(spread_id, exit_premium=current_net_premium, fx_rate=None)
-                except Exception as pe:
-                    logger.warning(f'{spread_id}: position close記録失敗: {pe}')
-                logger.warning(f'✓ {spread_id}: 損切りクローズ完了')
-            else:
-                logger.error(f'✗ {spread_id}: 損切り注文ステータス異常 {short_close_status}/{long_close_status}')
-
+                'close_order_ok': False,
+                'order_status': None,
+            }
+            actions.append(action)
+            pending_closes.append((action, trade_short, trade_long, spread_id, current_net_premium))
+
+        except (KeyError, ValueError, TypeError) as e:
+            logger.error(f'{spread_id}: ポジションデータ不正、スキップ: {e}')
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            # TWSとの接続が切れていれば残りのポジションの発注も失敗するため打ち切る
+            logger.error(f'ポジション監視: IBKR接続エラーのため中断（{spread_id}）: {e}')
+            break
         except Exception as e:
             logger.error(f'{spread_id}: 監視中エラー: {e}')
 
+    # 4. 決済注文のステータスはまとめて待ってから確認する
+    if pending_closes:
+        ib.sleep(5)
+
+    for action, trade_short, trade_long, spread_id, current_net_premium in pending_closes:
+        short_close_status = trade_short.orderStatus.status if trade_short else 'Unknown'
+        long_close_status = trade_long.orderStatus.status if trade_long else 'Unknown'
+
+        close_ok = short_close_status in ('Submitted', 'Filled', 'PreSubmitted') and \
+                   long_close_status in ('Submitted', 'Filled', 'PreSubmitted')
+
+        action['close_order_ok'] = close_ok
+        action['order_status'] = f'Short: {short_close_status}, Long: {long_close_status}'
+
+        if close_ok:
+            # PositionManager にクローズを記録
+            try:
+                pm.close_position(spread_id, exit_premium=current_net_premium, fx_rate=None)
+            except Exception as pe:
+                logger.warning(f'{spread_id}: position close記録失敗: {pe}')
+            logger.warning(f'✓ {spread_id}: 損切りクローズ完了')
+        else:
+            logger.error(f'✗ {spread_id}: 損切り注文ステータス異常 {short_close_status}/{long_close_status}')
+
     return actions
 
 
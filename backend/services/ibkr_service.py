@@ -5,20 +5,17 @@ ib_insyncを専用スレッドで実行（キューベース）
 
 import threading
 import asyncio
-import queue
+import time
+from collections import deque
 from concurrent.futures import Future
-from typing import Any, Callable, Optional, Tuple
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
 from ib_insync import IB, util
 import logging
-import sys
-import os
 
 # FastAPIとの互換性のためにasyncioをパッチ
 util.patchAsyncio()
 
-# 親ディレクトリをパスに追加
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
 import config
 
 logger = logging.getLogger(__name__)
@@ -47,16 +44,32 @@ class IBKRService:
         self._thread: Optional[threading.Thread] = None
         self._connected = False
         self._running = False
-        self._task_queue: queue.Queue[Tuple[Callable, tuple, dict, Future]] = queue.Queue()
+        # タスクキュー（append/popleftはスレッドセーフ）と、未接続時にワーカーを起こすイベント
+        self._tasks: Deque[Tuple[Callable, tuple, dict, Future]] = deque()
+        self._task_event = threading.Event()
+        # 接続中はワーカーのイベントループ上で待機するため、そのループと起床用イベント
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # accountSummary の短期キャッシュ（取得時刻, {tag: (value, currency)}）
+        self._acct_cache: Tuple[float, Optional[dict]] = (0.0, None)
+        self._acct_lock = asyncio.Lock()
+        # 読み取り系リクエスト用の接続プール（start_pool()で構築）
+        self._pool: Optional[asyncio.Queue] = None
+        self._pool_workers: List['IBKRService'] = []
+        self._workers_by_ib: Dict[int, 'IBKRService'] = {}
+        self._burst_limit = 0
+        self._bursting = 0
 
     @classmethod
     def get_instance(cls) -> 'IBKRService':
-        """シングルトンインスタンス取得"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = cls()
-        return cls._instance
+        """シングルトンインスタンス取得（生成済みならロックを取らずに返す）"""
+        instance = cls._instance
+        if instance is not None:
+            return instance
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
 
     def start(self, host: str = '127.0.0.1', port: int = 7497, client_id: int = 1):
         """
@@ -72,6 +85,9 @@ class IBKRService:
             # ただし、run_forever()は呼ばず、ib_insyncに制御を任せる
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
+            wakeup = asyncio.Event()
+            self._wakeup = wakeup
+            self._loop = loop
 
             try:
                 # 1. 専用スレッド内で「同期的に」接続
@@ -85,21 +101,30 @@ class IBKRService:
             finally:
                 connect_done.set()
 
-            # 2. メインループ: キューからタスクを取り出して実行
+            # 2. メインループ: キューに溜まったタスクをすべて取り出して実行
+            tasks = self._tasks
             while self._running:
                 try:
-                    # 短いタイムアウトでタスクを待機
-                    func, args, kwargs, future = self._task_queue.get(timeout=0.1)
-                    try:
-                        result = func(*args, **kwargs)
-                        future.set_result(result)
-                    except Exception as e:
-                        future.set_exception(e)
-                except queue.Empty:
-                    # 3. 重要：タスクがない間、ib.sleepでIBKRの内部イベント（Ticker更新等）を処理
-                    # これにより asyncio のループ競合を避けつつ、データを更新し続けられる
+                    # 先にクリアしておけば、取り出し後に積まれたタスクの通知も取りこぼさない
+                    self._task_event.clear()
+                    wakeup.clear()
+                    while tasks:
+                        func, args, kwargs, future = tasks.popleft()
+                        if not future.set_running_or_notify_cancel():
+                            continue  # 呼び出し側がタイムアウトで諦めたタスクは実行しない
+                        try:
+                            result = func(*args, **kwargs)
+                            future.set_result(result)
+                        except Exception as e:
+                            future.set_exception(e)
+
                     if self._connected:
-                        self.ib.sleep(0.01)
+                        # 3. 重要：タスクがない間、ib_insyncのループを回してIBKRの内部イベント（Ticker更新等）を処理
+                        # これにより asyncio のループ競合を避けつつ、データを更新し続けられる
+                        # タスクが積まれると _submit() がループを起こすので、待たずに次の周回へ進む
+                        util.run(_wait_for_task(wakeup, 0.1))
+                    else:
+                        self._task_event.wait(timeout=0.1)
                 except Exception as e:
                     logger.error(f"ワーカーエラー: {e}")
 
@@ -118,7 +143,7 @@ class IBKRService:
             try:
                 # 切断もキュー経由で専用スレッドで実行
                 future = Future()
-                self._task_queue.put((self.ib.disconnect, (), {}, future))
+                self._submit(self.ib.disconnect, (), {}, future)
                 future.result(timeout=5)
             except Exception as e:
                 logger.warning(f"IBKR切断時エラー: {e}")
@@ -126,8 +151,86 @@ class IBKRService:
 
         if self._thread:
             self._thread.join(timeout=5)
+
+        for worker in self._pool_workers:
+            worker.stop()
+        self._pool_workers = []
+        self._workers_by_ib = {}
+        self._pool = None
         logger.info("IBKRサービス停止")
 
+    def start_pool(self, size: int, host: str = '127.0.0.1', port: int = 7497,
+                   base_client_id: int = 2, burst_limit: int = 0):
+        """
+        読み取り系リクエスト用の追加接続を起動し、メイン接続と合わせてプールにする。
+        start() の後、lifespan startup時に呼ぶ。
+
+        各接続はそれぞれ専用スレッドとclientIdを持つため、プールから借りた
+        接続同士はIBKRへの問い合わせを並列に実行できる。
+        接続に失敗した追加接続はプールに入れない。
+
+        Args:
+            size: 追加接続数
+            host: TWSホスト
+            port: TWSポート
+            base_client_id: 追加接続の先頭clientId
+            burst_limit: 全接続が使用中のとき、待たずにメイン接続を共有できるリクエスト数
+        """
+        workers: List['IBKRService'] = [self]
+        for i in range(size):
+            worker = IBKRService()
+            try:
+                worker.start(host=host, port=port, client_id=base_client_id + i)
+            except Exception as e:
+                logger.warning(f"IBKRプール接続失敗 (clientId={base_client_id + i}): {e}")
+                worker.stop()
+                continue
+            self._pool_workers.append(worker)
+            workers.append(worker)
+
+        self._pool = asyncio.Queue()
+        for worker in workers:
+            self._pool.put_nowait(worker)
+        self._workers_by_ib = {id(worker.ib): worker for worker in workers}
+        self._burst_limit = burst_limit
+        logger.info(f"IBKR接続プール: {len(workers)}接続")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[IB]:
+        """
+        プールからIB接続を1つ借りる
+
+        借りた接続を execute() / execute_timeout() に渡すと、その接続の
+        専用スレッドで実行される。プール未構築時はメイン接続を返す。
+        切断された追加接続はプールから外し、以降は貸し出さない。
+
+        使い方:
+            async with service.acquire() as ib:
+                data = await service.execute(_fetch_spy_price, ib)
+        """
+        if self._pool is None:
+            yield self.ib
+            return
+
+        # 全接続が使用中でもburst_limitまではメイン接続のキューに相乗りさせる
+        if self._pool.empty() and self._bursting < self._burst_limit:
+            self._bursting += 1
+            try:
+                yield self.ib
+            finally:
+                self._bursting -= 1
+            return
+
+        worker = await self._pool.get()
+        while worker is not self and not worker.is_connected:
+            # メイン接続は除外しないため、プールが空のまま待ち続けることはない
+            logger.warning(f"IBKRプール: 切断された接続を除外 (clientId={worker.ib.client.clientId})")
+            worker = await self._pool.get()
+        try:
+            yield worker.ib
+        finally:
+            self._pool.put_nowait(worker)
+
     @property
     def is_connected(self) -> bool:
         return self._connected and self.ib.isConnected()
@@ -136,11 +239,26 @@ class IBKRService:
         """
         専用スレッドで同期関数を実行し、Futureを返す。
         内部用。通常は execute() を使う。
+
+        第1引数がプールの接続なら、その接続を持つスレッドで実行する。
         """
+        worker = self._workers_by_ib.get(id(args[0]), self) if args else self
         future = Future()
-        self._task_queue.put((func, args, kwargs, future))
+        worker._submit(func, args, kwargs, future)
         return future
 
+    def _submit(self, func: Callable, args: tuple, kwargs: dict, future: Future):
+        """タスクを自分の専用スレッドのキューに積んで起こす"""
+        self._tasks.append((func, args, kwargs, future))
+        self._task_event.set()
+        loop = self._loop
+        if loop is not None:
+            try:
+                # ループ内部のself-pipe経由で、待機中のワーカーをすぐに起こす
+                loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass  # ワーカー終了後（ループがclose済み）
+
     async def execute(self, func: Callable, *args, **kwargs) -> Any:
         """
         FastAPIのasyncコンテキストから呼ぶメインメソッド。
@@ -167,8 +285,7 @@ class IBKRService:
         """
         future = self.execute_sync(func, *args, **kwargs)
         # FastAPIのイベントループをブロックしないように待機
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, future.result, 30)  # 30秒タイムアウト
+        return await _await_future(future, 30)  # 30秒タイムアウト
 
     async def run(self, func: Callable, *args, **kwargs) -> Any:
         """execute()のエイリアス（後方互換性用）"""
@@ -177,8 +294,33 @@ class IBKRService:
     async def execute_timeout(self, timeout: int, func: Callable, *args, **kwargs) -> Any:
         """タイムアウトを指定してexecute()を実行"""
         future = self.execute_sync(func, *args, **kwargs)
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, future.result, timeout)
+        return await _await_future(future, timeout)
+
+    async def get_account_summary_cached(self, ttl: float = 3.0) -> dict:
+        """
+        accountSummary を辞書に変換して返す（TTLキャッシュ付き）
+
+        ダッシュボードのポーリングや複数クライアントからの同時アクセスで
+        TWSへの問い合わせが重複しないよう、ttl秒以内は前回の結果を返す。
+
+        Args:
+            ttl: キャッシュ有効期間（秒）
+
+        Returns:
+            dict: {tag: (value, currency)}
+        """
+        async with self._acct_lock:
+            ts, cached = self._acct_cache
+            if cached is not None and time.monotonic() - ts < ttl:
+                return cached
+
+            # 辞書への変換も専用スレッド側で行い、イベントループには完成品だけを返す
+            def _fetch_summary(ib):
+                return {item.tag: (item.value, item.currency) for item in ib.accountSummary()}
+
+            summary = await self.run(_fetch_summary, self.ib)
+            self._acct_cache = (time.monotonic(), summary)
+            return summary
 
     async def setup_streaming(self):
         """
@@ -251,9 +393,92 @@ class IBKRService:
 
         return {'usd_jpy': rate, 'source': 'IBKR'}
 
+    def get_streaming_snapshot(self) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        SPY価格とUSD/JPYレートをまとめて返す
+
+        どちらもワーカースレッドが更新済みのTickerを読むだけなので、
+        キューを経由せずイベントループ上でそのまま取得する。
+        片方の取得に失敗してももう片方は返す。
+
+        Returns:
+            Tuple: (SPY価格, USD/JPYレート)
+        """
+        try:
+            spy = self.get_streaming_spy_price()
+        except Exception as e:
+            logger.debug(f"SPYストリーミング値の取得失敗: {e}")
+            spy = None
+        try:
+            fx = self.get_streaming_fx_rate()
+        except Exception as e:
+            logger.debug(f"FXストリーミング値の取得失敗: {e}")
+            fx = None
+        return spy, fx
+
+
+# --- ワーカースレッド内で使うヘルパー関数 ---
+
+async def _await_future(future: Future, timeout: float) -> Any:
+    """
+    ワーカースレッドのFutureをイベントループ上で待つ
+
+    完了コールバックでコルーチンを起こすので、待機のためにスレッドプールの
+    スレッドを塞がない（asyncio.to_thread などと共有のデフォルトプールを圧迫しない）。
+    タイムアウト時はFutureをキャンセルし、まだ始まっていないタスクは実行されない。
+
+    Args:
+        future: execute_sync() が返したFuture
+        timeout: タイムアウト（秒）
+
+    Returns:
+        Any: タスクの戻り値
+    """
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+
+async def _wait_for_task(wakeup: asyncio.Event, timeout: float):
+    """タスクが積まれるか timeout 秒経つまで待つ（ワーカーのループ上で実行）"""
+    try:
+        await asyncio.wait_for(wakeup.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+def wait_for_tickers(ib, tickers: list, is_ready: Callable[[Any], bool], timeout: float) -> bool:
+    """
+    全Tickerが条件を満たすまでイベント駆動で待機する（ワーカースレッド内で呼ぶ）
+
+    固定時間の ib.sleep() の代わりに ib.waitOnUpdate() で更新ごとに条件を確認し、
+    揃った時点ですぐに戻る。timeout経過時は揃っていなくても戻る。
+
+    Args:
+        ib: IBインスタンス
+        tickers: 待機対象のTickerリスト
+        is_ready: Tickerのデータが揃ったかを判定する関数
+        timeout: 最大待機時間（秒）
+
+    Returns:
+        bool: timeout内に全Tickerが揃った場合True
+    """
+    deadline = time.monotonic() + timeout
+    # 揃ったTickerは以降の判定から外し、更新のたびに未到着分だけを確認する
+    pending = [t for t in tickers if not is_ready(t)]
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        ib.waitOnUpdate(timeout=remaining)
+        pending = [t for t in pending if not is_ready(t)]
+    return True
+
 
 # --- Depends用のヘルパー関数 ---
 
+# get_ibkr_service() 用に保持するシングルトン（リクエストごとのクラスメソッド呼び出しを省く）
+_ibkr_singleton: Optional[IBKRService] = None
+
+
 def get_ibkr_service() -> IBKRService:
     """
     FastAPIのDependsで使用するヘルパー関数
@@ -268,7 +493,10 @@ def get_ibkr_service() -> IBKRService:
     """
     from fastapi import HTTPException
 
-    service = IBKRService.get_instance()
+    global _ibkr_singleton
+    service = _ibkr_singleton
+    if service is None:
+        service = _ibkr_singleton = IBKRService.get_instance()
     if not service.is_connected:
         raise HTTPException(status_code=503, detail="IBKR未接続")
     return service
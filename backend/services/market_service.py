@@ -2,11 +2,6 @@
 マーケットデータサービス: SPY価格とVIX取得
 """
 
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
 from typing import Dict, Optional
 
 
@@ -2,12 +2,8 @@
 オプションサービス: オプションチェーン取得とスプレッド計算
 """
 
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
 import config
+import numpy as np
 from typing import List, Dict, Optional
 from datetime import datetime
 
@@ -75,56 +71,71 @@ class OptionsService:
                 options_by_expiry[expiry] = []
             options_by_expiry[expiry].append(option)
 
+        width = config.SPREAD_WIDTH
+        delta_min, delta_max = config.DELTA_RANGE
         candidates = []
 
-        # 各満期日でスプレッドを生成
+        # 各満期日でスプレッドを生成（指標は満期ごとにNumPyでまとめて計算）
         for expiry, options in options_by_expiry.items():
-            # デルタでソート
-            sorted_options = sorted(options, key=lambda x: x.get('delta', 0) or 0)
-
-            # 目標デルタに近いオプションを探す
-            for option in sorted_options:
-                delta = option.get('delta', 0)
-                if not delta or delta < config.DELTA_RANGE[0] or delta > config.DELTA_RANGE[1]:
-                    continue
-
-                # ロングストライク（売りストライク - スプレッド幅）を探す
-                short_strike = option['strike']
-                long_strike = short_strike - config.SPREAD_WIDTH
-
-                # ロングプットを見つける
-                long_option = next((o for o in options if o['strike'] == long_strike), None)
-                if not long_option:
-                    continue
-
-                # スプレッド指標を計算
-                spread_premium = option['mid'] - long_option['mid']
-                max_profit = spread_premium * 100
-                max_loss = (config.SPREAD_WIDTH - spread_premium) * 100
-                risk_reward_ratio = abs(max_loss / max_profit) if max_profit > 0 else 999
-                win_probability = 1 - abs(delta)
-
-                # スコア計算
-                delta_score = 40 if abs(delta - config.TARGET_DELTA) < 0.05 else 20
-                premium_score = min(30, (spread_premium / 2.0) * 30)
-                dte_score = 20 if 2 <= option['dte'] <= 5 else 10
-                rr_score = 10 if risk_reward_ratio <= 4 else 5
-                score = delta_score + premium_score + dte_score + rr_score
-
+            n = len(options)
+            strikes = np.fromiter((o['strike'] for o in options), float, n)
+            deltas = np.fromiter((o.get('delta', 0) or 0 for o in options), float, n)
+            mids = np.fromiter((o['mid'] for o in options), float, n)
+            dtes = np.fromiter((o['dte'] for o in options), float, n)
+
+            # 目標デルタ範囲のショート候補（先に絞り込み、残った分だけをデルタ昇順に並べる）
+            in_range = np.flatnonzero((deltas >= delta_min) & (deltas <= delta_max))
+            short_idx = in_range[np.argsort(deltas[in_range], kind='stable')]
+
+            # ロングストライク（売りストライク - スプレッド幅）をストライク→位置の辞書で引く
+            strike_idx = {}
+            for i, strike in enumerate(strikes.tolist()):
+                strike_idx.setdefault(strike, i)
+            long_idx = np.fromiter(
+                (strike_idx.get(s - width, -1) for s in strikes[short_idx].tolist()), int, len(short_idx)
+            )
+            has_long = long_idx >= 0
+            short_idx = short_idx[has_long]
+            long_idx = long_idx[has_long]
+            if not len(short_idx):
+                continue
+
+            # スプレッド指標を計算
+            short_delta = deltas[short_idx]
+            spread_premium = mids[short_idx] - mids[long_idx]
+            max_profit = spread_premium * 100
+            max_loss = (width - spread_premium) * 100
+            with np.errstate(divide='ignore', invalid='ignore'):
+                risk_reward_ratio = np.where(max_profit > 0, np.abs(max_loss / max_profit), 999)
+            win_probability = 1 - np.abs(short_delta)
+
+            # スコア計算
+            dte = dtes[short_idx]
+            delta_score = np.where(np.abs(short_delta - config.TARGET_DELTA) < 0.05, 40, 20)
+            premium_score = np.minimum(30, (spread_premium / 2.0) * 30)
+            dte_score = np.where((2 <= dte) & (dte <= 5), 20, 10)
+            rr_score = np.where(risk_reward_ratio <= 4, 10, 5)
+            score = delta_score + premium_score + dte_score + rr_score
+
+            for i, premium, profit, loss, rr, win_prob, total in zip(
+                short_idx.tolist(), spread_premium.tolist(), max_profit.tolist(), max_loss.tolist(),
+                risk_reward_ratio.tolist(), win_probability.tolist(), score.tolist()
+            ):
+                option = options[i]
                 candidates.append({
-                    'short_strike': short_strike,
-                    'long_strike': long_strike,
+                    'short_strike': option['strike'],
+                    'long_strike': option['strike'] - width,
                     'expiry': expiry,
                     'exp_date': option['exp_date'],
                     'dte': option['dte'],
-                    'short_delta': delta,
+                    'short_delta': option['delta'],
                     'short_iv': option.get('iv'),
-                    'spread_premium_mid': spread_premium,
-                    'max_profit': max_profit,
-                    'max_loss': max_loss,
-                    'risk_reward_ratio': risk_reward_ratio,
-                    'win_probability': win_probability,
-                    'score': score
+                    'spread_premium_mid': premium,
+                    'max_profit': profit,
+                    'max_loss': loss,
+                    'risk_reward_ratio': rr,
+                    'win_probability': win_prob,
+                    'score': total
                 })
 
         # スコアでソート
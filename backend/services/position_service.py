@@ -2,11 +2,6 @@
 ポジションサービス: ポジション管理とP&L計算
 """
 
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
 from typing import List, Dict, Optional
 
 
@@ -40,6 +35,21 @@ class PositionService:
         """
         return self.position_manager.get_open_positions()
 
+    def get_positions(self, status: Optional[str] = None) -> List[Dict]:
+        """
+        ステータスで絞り込んだポジションを取得（全件の走査は1回だけ）
+
+        Args:
+            status: フィルター（open/closed/expired、Noneなら全件）
+
+        Returns:
+            list: ポジションのリスト
+        """
+        positions = self.position_manager.positions.values()
+        if not status:
+            return list(positions)
+        return [p for p in positions if p['status'] == status]
+
     def get_position_by_id(self, spread_id: str) -> Optional[Dict]:
         """
         IDでポジションを取得
@@ -66,7 +76,7 @@ class PositionService:
         spread_id: str,
         exit_premium: float,
         fx_rate: Optional[float] = None
-    ) -> bool:
+    ) -> Optional[Dict]:
         """
         ポジションをクローズ
 
@@ -76,18 +86,19 @@ class PositionService:
             fx_rate: 為替レート
 
         Returns:
-            bool: 成功ならTrue
+            dict: クローズ後のポジション（存在しない・オープンでない・失敗時はNone）
         """
         try:
-            self.position_manager.close_position(
+            closed = self.position_manager.close_position(
                 spread_id=spread_id,
                 exit_premium=exit_premium,
-                fx_rate_usd_jpy=fx_rate
+                fx_rate=fx_rate
             )
-            return True
         except Exception as e:
             print(f"Error closing position: {e}")
-            return False
+            return None
+
+        return self.position_manager.get_position(spread_id) if closed else None
 
     def calculate_unrealized_pnl(
         self,
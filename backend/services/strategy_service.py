@@ -6,16 +6,28 @@ VIX連動デルタ調整、イベントカレンダー回避、Fear & Greed Inde
 
 from datetime import datetime, timedelta
 from typing import Optional, Tuple
+import threading
+import time
 import requests
-import sys
-import os
-
-# 親ディレクトリをパスに追加
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import config
 from backend.services import market_service as market_svc
 
+# Fear & Greed Index の直近取得結果（取得時刻, データ）。指数の更新は日中でも数分おき程度
+_fg_cache: Tuple[float, Optional[dict]] = (0.0, None)
+_fg_lock = threading.Lock()
+
+# Fear & Greed Index 取得用のセッション（キャッシュ切れのたびにTCP/TLS接続を張り直さない）
+_fg_session = requests.Session()
+_fg_session.headers['User-Agent'] = 'Mozilla/5.0'
+_fg_session.mount('https://', HTTPAdapter(
+    pool_maxsize=4,
+    # 再試行は502/503/504の応答のみ（タイムアウトを再試行すると障害時の待ち時間が何倍にも延びる）
+    max_retries=Retry(total=2, connect=1, read=0, backoff_factor=0.2, status_forcelist=(502, 503, 504))
+))
+
 
 def get_adjusted_delta(vix: float) -> Tuple[Optional[float], float]:
     """
@@ -50,15 +62,33 @@ def get_fear_greed_index() -> Optional[dict]:
     取得失敗時はモック値を返す（開発用）
     本番環境では別のデータソース使用を推奨
 
+    Returns:
+        {'score': 45, 'rating': 'Fear', 'timestamp': '...'} or mock data
+    """
+    global _fg_cache
+
+    # 同時に呼ばれても取得は1回だけにし、FEAR_GREED_CACHE_TTL 内は前回の値を返す
+    # 取得失敗（モック値）も FEAR_GREED_FAILURE_TTL の間は再利用し、障害中に毎回待たされないようにする
+    with _fg_lock:
+        cached_at, cached = _fg_cache
+        if cached is not None:
+            ttl = config.FEAR_GREED_FAILURE_TTL if cached.get('is_mock') else config.FEAR_GREED_CACHE_TTL
+            if time.monotonic() - cached_at < ttl:
+                return cached
+        fear_greed = _fetch_fear_greed_index()
+        _fg_cache = (time.monotonic(), fear_greed)
+        return fear_greed
+
+
+def _fetch_fear_greed_index() -> dict:
+    """
+    CNN Fear & Greed Index をAPIから取得
+
     Returns:
         {'score': 45, 'rating': 'Fear', 'timestamp': '...'} or mock data
     """
     try:
-        response = requests.get(
-            config.FEAR_GREED_API_URL,
-            timeout=config.FEAR_GREED_TIMEOUT,
-            headers={'User-Agent': 'Mozilla/5.0'}  # User-Agentを追加
-        )
+        response = _fg_session.get(config.FEAR_GREED_API_URL, timeout=config.FEAR_GREED_TIMEOUT)
 
         if response.status_code == 200:
             data = response.json()
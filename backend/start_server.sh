@@ -11,5 +11,10 @@ echo "Starting FastAPI Dashboard..."
 echo "PYTHONPATH: $PYTHONPATH"
 echo ""
 
-# uvicornで起動
-python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+# イベントループ: モックモードは uvloop、リアルモードは asyncio
+# （ib_insync の patchAsyncio() が uvloop に対応していないため。main.py の直接起動と同じ判定）
+LOOP=$(python3 -c "import sys, config; print('uvloop' if config.USE_MOCK_DATA and sys.platform != 'win32' else 'asyncio')" 2>/dev/null || echo asyncio)
+echo "Event loop: $LOOP"
+
+# uvicornで起動（HTTPパーサーは httptools）
+python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --reload --loop "$LOOP" --http httptools
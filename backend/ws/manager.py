@@ -3,11 +3,24 @@ WebSocket接続マネージャー: リアルタイム価格配信
 """
 
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List, Dict, Set
+from typing import List, Dict, Set, Tuple, Union
 import asyncio
-import json
-from datetime import datetime
-import pytz
+import time
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # msgpack未インストール時はJSONのみ対応
+    msgpack = None
+
+# ワイヤーフォーマット
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+
+
+def epoch_ms() -> int:
+    """配信メッセージ用タイムスタンプ（UNIXエポックからのミリ秒）"""
+    return time.time_ns() // 1_000_000
 
 
 class ConnectionManager:
@@ -17,17 +30,27 @@ class ConnectionManager:
         """初期化"""
         self.active_connections: List[WebSocket] = []
         self.subscriptions: Dict[WebSocket, Set[str]] = {}  # WebSocket -> {channel1, channel2, ...}
+        self.formats: Dict[WebSocket, str] = {}  # WebSocket -> "json" / "msgpack"
+        # チャンネル -> 購読中のWebSocket（配信時に購読者だけを走査するための逆引き）
+        # 誰も購読していないチャンネルのキーは残さない（チャンネル名はクライアント由来のため）
+        self._channel_subs: Dict[str, Set[WebSocket]] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, fmt: str = FORMAT_JSON):
         """
         WebSocket接続を受け入れる
 
         Args:
             websocket: WebSocketインスタンス
+            fmt: 配信フォーマット ("json" / "msgpack")
+                 msgpack未インストール時はJSONにフォールバック
         """
+        if fmt != FORMAT_MSGPACK or msgpack is None:
+            fmt = FORMAT_JSON
+
         await websocket.accept()
         self.active_connections.append(websocket)
         self.subscriptions[websocket] = set()
+        self.formats[websocket] = fmt
 
     def disconnect(self, websocket: WebSocket):
         """
@@ -38,8 +61,9 @@ class ConnectionManager:
         """
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
-        if websocket in self.subscriptions:
-            del self.subscriptions[websocket]
+        for channel in self.subscriptions.pop(websocket, ()):
+            self._remove_channel_sub(channel, websocket)
+        self.formats.pop(websocket, None)
 
     async def subscribe(self, websocket: WebSocket, channel: str):
         """
@@ -51,6 +75,7 @@ class ConnectionManager:
         """
         if websocket in self.subscriptions:
             self.subscriptions[websocket].add(channel)
+            self._channel_subs.setdefault(channel, set()).add(websocket)
 
     async def unsubscribe(self, websocket: WebSocket, channel: str):
         """
@@ -62,6 +87,43 @@ class ConnectionManager:
         """
         if websocket in self.subscriptions:
             self.subscriptions[websocket].discard(channel)
+            self._remove_channel_sub(channel, websocket)
+
+    def _remove_channel_sub(self, channel: str, websocket: WebSocket):
+        """逆引きからWebSocketを外し、購読者がいなくなったチャンネルは削除する"""
+        subscribers = self._channel_subs.get(channel)
+        if subscribers is None:
+            return
+        subscribers.discard(websocket)
+        if not subscribers:
+            del self._channel_subs[channel]
+
+    def _subscribers(self, *channels: str) -> Set[WebSocket]:
+        """
+        指定チャンネル（または"all"）を購読している接続を返す
+
+        Args:
+            channels: チャンネル名
+
+        Returns:
+            Set[WebSocket]: 購読中の接続
+        """
+        subscribers = set(self._channel_subs.get("all", ()))
+        for channel in channels:
+            subscribers.update(self._channel_subs.get(channel, ()))
+        return subscribers
+
+    def has_subscribers(self, *channels: str) -> bool:
+        """
+        指定チャンネル（または"all"）の購読者がいるか
+
+        Args:
+            channels: チャンネル名
+
+        Returns:
+            bool: 購読者が1人以上いればTrue
+        """
+        return any(self._channel_subs.get(channel) for channel in ("all",) + channels)
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """
@@ -72,34 +134,139 @@ class ConnectionManager:
             websocket: WebSocketインスタンス
         """
         try:
-            await websocket.send_json(message)
+            await self._send(websocket, self._encode(message, self.formats.get(websocket, FORMAT_JSON)))
         except:
             # 送信失敗時は接続を切断
             self.disconnect(websocket)
 
+    async def send_pong(self, websocket: WebSocket):
+        """
+        pingへの応答を送信（エンコード済みペイロードを再利用）
+
+        Args:
+            websocket: WebSocketインスタンス
+        """
+        try:
+            await self._send(websocket, _PONG_PAYLOADS[self.formats.get(websocket, FORMAT_JSON)])
+        except:
+            self.disconnect(websocket)
+
+    @staticmethod
+    def _encode(message: dict, fmt: str = FORMAT_JSON) -> Union[str, bytes]:
+        """
+        メッセージをワイヤーフォーマットにエンコード
+
+        Returns:
+            JSONの場合は文字列（テキストフレーム）、MessagePackの場合はbytes
+        """
+        if fmt == FORMAT_MSGPACK:
+            return msgpack.packb(message)
+        return orjson.dumps(message, option=orjson.OPT_NAIVE_UTC).decode()
+
+    @staticmethod
+    async def _send(websocket: WebSocket, payload: Union[str, bytes]):
+        """エンコード済みペイロードをテキスト/バイナリフレームで送信"""
+        if isinstance(payload, bytes):
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+
+    async def _send_all(self, targets: List[Tuple[WebSocket, Union[str, bytes]]]):
+        """
+        エンコード済みペイロードを各接続へ並行送信し、失敗した接続を切断
+
+        Args:
+            targets: (WebSocket, 送信ペイロード) のリスト
+        """
+        if not targets:
+            return
+
+        results = await asyncio.gather(
+            *(self._send(connection, payload) for connection, payload in targets),
+            return_exceptions=True
+        )
+
+        # 切断された接続を削除
+        for (connection, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
+
     async def broadcast(self, message: dict, channel: str = "all"):
         """
         チャンネルを購読している全接続にブロードキャスト
 
+        メッセージのエンコードはフォーマットごとに1回だけ行い、
+        同じペイロード（同一のstr/bytesオブジェクト）を全接続に送信する。
+        接続ごとのコピーやスライスは行わない。
+
         Args:
             message: 送信するメッセージ
             channel: チャンネル名
         """
-        disconnected = []
+        subscribers = self._subscribers(channel)
+        if not subscribers:
+            return
 
-        for connection in self.active_connections:
-            # 購読チェック
-            if connection in self.subscriptions:
-                subscribed_channels = self.subscriptions[connection]
-                if "all" in subscribed_channels or channel in subscribed_channels:
-                    try:
-                        await connection.send_json(message)
-                    except:
-                        disconnected.append(connection)
+        encoded: Dict[str, Union[str, bytes]] = {}
+        targets = []
+        for connection in subscribers:
+            fmt = self.formats.get(connection, FORMAT_JSON)
+            if fmt not in encoded:
+                encoded[fmt] = self._encode(message, fmt)
+            targets.append((connection, encoded[fmt]))
 
-        # 切断された接続を削除
-        for connection in disconnected:
-            self.disconnect(connection)
+        await self._send_all(targets)
+
+    async def broadcast_batch(self, updates: List[Tuple[str, dict]]):
+        """
+        複数チャンネルの更新を1フレームにまとめてブロードキャスト
+
+        接続ごとに購読チャンネルに該当する更新だけを抽出し、
+        {"type": "batch", "updates": [...]} として1回で送信する。
+        同じ組み合わせ・フォーマットの更新はエンコードを1回だけ行う。
+
+        Args:
+            updates: (チャンネル名, メッセージ) のリスト
+        """
+        if not updates:
+            return
+
+        encoded: Dict[Tuple[Tuple[int, ...], str], Union[str, bytes]] = {}
+        targets = []
+
+        # 更新対象チャンネルの購読者だけを走査する
+        for connection in self._subscribers(*(channel for channel, _ in updates)):
+            subscribed_channels = self.subscriptions.get(connection)
+            if not subscribed_channels:
+                continue
+
+            if "all" in subscribed_channels:
+                selected = tuple(range(len(updates)))
+            else:
+                selected = tuple(
+                    i for i, (channel, _) in enumerate(updates)
+                    if channel in subscribed_channels
+                )
+            if not selected:
+                continue
+
+            fmt = self.formats.get(connection, FORMAT_JSON)
+            payload = encoded.get((selected, fmt))
+            if payload is None:
+                if len(selected) == 1:
+                    # 1件のみの場合は従来どおり単体メッセージとして送る
+                    message = updates[selected[0]][1]
+                else:
+                    message = {
+                        "type": "batch",
+                        "updates": [updates[i][1] for i in selected]
+                    }
+                payload = self._encode(message, fmt)
+                encoded[(selected, fmt)] = payload
+
+            targets.append((connection, payload))
+
+        await self._send_all(targets)
 
     def get_connection_count(self) -> int:
         """
@@ -111,6 +278,11 @@ class ConnectionManager:
         return len(self.active_connections)
 
 
+# pong応答はフォーマットごとに一度だけエンコードしておく
+_PONG_PAYLOADS: Dict[str, Union[str, bytes]] = {FORMAT_JSON: ConnectionManager._encode({"type": "pong"})}
+if msgpack is not None:
+    _PONG_PAYLOADS[FORMAT_MSGPACK] = ConnectionManager._encode({"type": "pong"}, FORMAT_MSGPACK)
+
 # グローバルインスタンス
 manager = ConnectionManager()
 
@@ -131,7 +303,7 @@ async def broadcast_spy_price(market_data_manager):
                     message = {
                         "type": "spy_price",
                         "data": price_data,
-                        "timestamp": datetime.now(pytz.UTC).isoformat()
+                        "timestamp": epoch_ms()
                     }
                     await manager.broadcast(message, channel="spy")
 
@@ -156,7 +328,7 @@ async def broadcast_options_data(market_data_manager):
                 message = {
                     "type": "options_update",
                     "data": {"status": "available"},
-                    "timestamp": datetime.now(pytz.UTC).isoformat()
+                    "timestamp": epoch_ms()
                 }
                 await manager.broadcast(message, channel="options")
 
@@ -182,7 +354,7 @@ async def broadcast_fx_rate(fx_rate_manager):
                     message = {
                         "type": "fx_rate",
                         "data": rate_data,
-                        "timestamp": datetime.now(pytz.UTC).isoformat()
+                        "timestamp": epoch_ms()
                     }
                     await manager.broadcast(message, channel="fx")
 
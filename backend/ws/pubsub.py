@@ -0,0 +1,128 @@
+"""
+WebSocket配信のプロセス間中継: broadcaster（Redis Pub/Sub等）経由のファンアウト
+
+config.WS_BROADCAST_URL が設定されている場合、ストリーミング更新をPub/Subに
+publishし、各ワーカープロセスの中継タスクが自プロセスの接続へ配信する。
+未設定の場合は従来どおりプロセス内の ConnectionManager に直接配信する。
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+import orjson
+
+try:
+    from broadcaster import Broadcast
+except ImportError:  # broadcaster未インストール時はプロセス内配信のみ
+    Broadcast = None
+
+from ws.manager import manager
+
+logger = logging.getLogger(__name__)
+
+# Pub/Subチャンネル名
+MARKET_CHANNEL = 'market_updates'
+
+# 購読が切れたときの再購読間隔（秒）。失敗が続くたびに倍にし、上限で頭打ち
+RELAY_RETRY_MIN = 1.0
+RELAY_RETRY_MAX = 30.0
+
+
+class MarketBus:
+    """ストリーミング更新のpublish/中継を管理するクラス"""
+
+    def __init__(self):
+        """初期化"""
+        self._broadcast = None
+        self._relay_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_remote(self) -> bool:
+        """Pub/Sub経由で配信しているかどうか"""
+        return self._broadcast is not None
+
+    async def connect(self, url: str):
+        """
+        Pub/Subに接続し、中継タスクを開始
+
+        Args:
+            url: broadcasterの接続URL（空の場合はプロセス内配信）
+        """
+        if not url:
+            return
+
+        if Broadcast is None:
+            logger.warning('WS_BROADCAST_URLが設定されていますが broadcaster が未インストールのため、プロセス内配信を使用します')
+            return
+
+        broadcast = Broadcast(url)
+        await broadcast.connect()
+        self._broadcast = broadcast
+        self._relay_task = asyncio.create_task(self._relay())
+        self._relay_task.add_done_callback(_log_relay_exit)
+        logger.info(f'WebSocket配信: Pub/Sub経由 ({url})')
+
+    async def disconnect(self):
+        """中継タスクを停止してPub/Subから切断"""
+        if self._relay_task:
+            self._relay_task.cancel()
+            self._relay_task = None
+
+        if self._broadcast:
+            await self._broadcast.disconnect()
+            self._broadcast = None
+
+    async def publish(self, updates: List[Tuple[str, dict]]):
+        """
+        ストリーミング更新を配信
+
+        Args:
+            updates: (チャンネル名, メッセージ) のリスト
+        """
+        if self._broadcast is None:
+            await manager.broadcast_batch(updates)
+            return
+
+        await self._broadcast.publish(
+            channel=MARKET_CHANNEL,
+            message=orjson.dumps(updates).decode()
+        )
+
+    async def _relay(self):
+        """
+        Pub/Subから受信した更新を自プロセスの接続へ配信
+
+        1件の処理に失敗してもログに残して次の更新へ進む。購読が切れた場合は
+        間隔を空けて再購読し、publishが成功しているのに配信だけ止まる状態を避ける。
+        """
+        retry_delay = RELAY_RETRY_MIN
+        while True:
+            try:
+                async with self._broadcast.subscribe(channel=MARKET_CHANNEL) as subscriber:
+                    retry_delay = RELAY_RETRY_MIN
+                    async for event in subscriber:
+                        if manager.get_connection_count() == 0:
+                            continue
+                        try:
+                            updates = [(channel, message) for channel, message in orjson.loads(event.message)]
+                            await manager.broadcast_batch(updates)
+                        except Exception as e:
+                            logger.error(f'Pub/Sub中継: 更新の配信に失敗: {e}')
+                logger.warning(f'Pub/Sub中継: 購読が終了しました。{retry_delay:.0f}秒後に再購読します')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Pub/Sub中継: 購読エラー: {e}。{retry_delay:.0f}秒後に再購読します')
+
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, RELAY_RETRY_MAX)
+
+
+def _log_relay_exit(task: asyncio.Task):
+    """中継タスクが想定外に終了した場合にログに残す"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f'Pub/Sub中継タスクが停止しました: {task.exception()!r}')
+
+
+# グローバルインスタンス
+bus = MarketBus()
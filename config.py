@@ -8,6 +8,12 @@ TWS_PORT_PAPER = 7497  # ペーパー口座
 TWS_PORT_LIVE = 7496   # リアル口座
 CLIENT_ID = 1
 
+# APIの読み取り系リクエスト用の追加接続（既定は無効）
+# 接続ごとにclientIdとマーケットデータのライン数を消費するため、必要な場合のみ有効にする
+IBKR_POOL_SIZE = 0          # 追加接続数（0でメイン接続のみ）
+IBKR_POOL_CLIENT_ID = 11    # 追加接続の先頭clientId（test_connection.py 等の clientId=2 と重ならない番号）
+IBKR_POOL_BURST_LIMIT = 2   # 全接続が使用中のとき、メイン接続を待たずに共有できるリクエスト数
+
 # デフォルトはペーパー口座を使用
 USE_PAPER_ACCOUNT = True
 TWS_PORT = TWS_PORT_PAPER if USE_PAPER_ACCOUNT else TWS_PORT_LIVE
@@ -93,6 +99,8 @@ MAX_OPEN_POSITIONS = 2        # 同時オープンポジションの上限（買
 # Fear & Greed Index
 FEAR_GREED_API_URL = 'https://production.dataviz.cnn.io/index/fearandgreed/graphdata'
 FEAR_GREED_TIMEOUT = 10        # 取得タイムアウト（秒）
+FEAR_GREED_CACHE_TTL = 600     # 取得結果の再利用期間（秒）
+FEAR_GREED_FAILURE_TTL = 60    # 取得失敗（モック値）の再利用期間（秒）
 
 # メール通知（環境変数から読み込み）
 import os
@@ -102,6 +110,14 @@ SMTP_PORT_NUM = int(os.getenv('SMTP_PORT_NUM', str(SMTP_PORT)))
 SMTP_USER = os.getenv('EMAIL_USERNAME', os.getenv('SMTP_USER', ''))
 SMTP_PASSWORD_VAR = os.getenv('EMAIL_PASSWORD', os.getenv('SMTP_PASSWORD', ''))
 
+# ダッシュボード WebSocket 配信
+# 複数ワーカーで起動する場合に設定（例: 'redis://localhost:6379'）
+# 空の場合はプロセス内で直接配信する
+WS_BROADCAST_URL = os.getenv('WS_BROADCAST_URL', '')
+
+# ダッシュボード API の CORS
+CORS_DEV_MODE = False  # Trueの場合、全メソッド・全ヘッダーを許可（フロントエンド開発用）
+
 # イベントカレンダー（2026年）
 ECONOMIC_EVENTS = {
     # FOMC（水曜14:00 ET発表）
@@ -66,7 +66,7 @@ export default function OptionsPage() {
         ...spyData,
         last: liveSpyPrice,
         mid: liveSpyPrice,
-        timestamp: new Date().toISOString(),
+        timestamp: Date.now(),
       });
     }
   }, [liveSpyPrice]);
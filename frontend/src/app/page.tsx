@@ -62,7 +62,7 @@ export default function Home() {
         ...spyData,
         last: liveSpyPrice,
         mid: liveSpyPrice,
-        timestamp: new Date().toISOString(),
+        timestamp: Date.now(),
       });
     }
   }, [liveSpyPrice]);
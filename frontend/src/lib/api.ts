@@ -104,7 +104,7 @@ export async function getSpyPrice() {
     bid: number | null;
     ask: number | null;
     mid: number | null;
-    timestamp: string;
+    timestamp: number;  // UNIXエポックからのミリ秒
     is_delayed: boolean;
   }>('/api/market/spy');
 }
@@ -96,7 +96,7 @@ export function formatDate(dateString: string | null | undefined): string {
 /**
  * 相対時間フォーマット（例: "2 hours ago"）
  */
-export function formatRelativeTime(dateString: string): string {
+export function formatRelativeTime(dateString: string | number): string {
   const date = new Date(dateString);
   const now = new Date();
   const diffMs = now.getTime() - date.getTime();
@@ -6,7 +6,8 @@
 export type WebSocketMessage = {
   type: string;
   data: any;
-  timestamp?: string;
+  timestamp?: number;  // UNIXエポックからのミリ秒
+  updates?: WebSocketMessage[];
 };
 
 export type WebSocketCallback = (message: WebSocketMessage) => void;
@@ -166,6 +167,12 @@ export class WebSocketClient {
    * 受信したメッセージを処理
    */
   private handleMessage(message: WebSocketMessage): void {
+    // バッチメッセージは個別メッセージに展開して処理
+    if (message.type === 'batch' && message.updates) {
+      message.updates.forEach((update) => this.handleMessage(update));
+      return;
+    }
+
     const callbacks = this.callbacks.get(message.type);
     if (callbacks) {
       callbacks.forEach((callback) => {
@@ -196,7 +203,10 @@ let isCreating = false;
 export function getWebSocketClient(): WebSocketClient {
   if (!wsClient && !isCreating) {
     isCreating = true;
-    const wsUrl = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000/ws';
+    const baseUrl = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000/ws';
+    // 複数ワーカー構成ではシャードIDをパスに付けてプロキシ側で振り分ける
+    const shards = Number(process.env.NEXT_PUBLIC_WS_SHARDS || '1');
+    const wsUrl = shards > 1 ? `${baseUrl}/${Math.floor(Math.random() * shards)}` : baseUrl;
     wsClient = new WebSocketClient(wsUrl);
     console.log('[WebSocket] Singleton instance created');
     isCreating = false;
@@ -41,7 +41,7 @@ export interface SpyPrice {
   bid: number | null;
   ask: number | null;
   mid: number | null;
-  timestamp: string;
+  timestamp: number;  // UNIXエポックからのミリ秒
   is_delayed: boolean;
 }
 
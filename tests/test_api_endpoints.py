@@ -12,6 +12,8 @@ import pytest
 from httpx import AsyncClient
 import sys
 import os
+import math
+from statistics import NormalDist
 
 # プロジェクトルートをパスに追加
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,6 +21,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # モックモードを強制
 os.environ['USE_MOCK_DATA'] = 'True'
 
+# ib_insyncはインポート時にイベントループを参照するため、非同期テストが走る前（収集時）に読み込む
+from backend.services.auto_trader import _cents, _estimate_strike_for_delta  # noqa: E402
+
 
 @pytest.fixture
 async def client():
@@ -213,6 +218,19 @@ class TestStrategyEndpoints:
         assert "NFP" in data["events"]
         assert "CPI" in data["events"]
 
+    @pytest.mark.asyncio
+    async def test_event_calendar_not_modified(self, client):
+        """同じETagでの再取得は304"""
+        response = await client.get("/api/strategy/event-calendar")
+        etag = response.headers["etag"]
+
+        response = await client.get(
+            "/api/strategy/event-calendar",
+            headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
 
 class TestAccountEndpoints:
     """アカウントエンドポイントのテスト"""
@@ -281,5 +299,79 @@ class TestFXEndpoints:
         assert data["tts_rate"] == data["spot_rate"] + data["margin"]
 
 
+class TestWebSocketBroadcast:
+    """WebSocketブロードキャストのテスト"""
+
+    class _FakeWebSocket:
+        """送信されたペイロードを記録するだけのWebSocket"""
+
+        def __init__(self):
+            self.sent = []
+
+        async def accept(self):
+            pass
+
+        async def send_bytes(self, data):
+            self.sent.append(data)
+
+        async def send_text(self, data):
+            self.sent.append(data)
+
+    @pytest.mark.asyncio
+    async def test_broadcast_shares_encoded_bytes(self):
+        """バイナリ配信で全接続に同一のbytesオブジェクトが渡される（接続ごとにコピーしない）"""
+        pytest.importorskip("msgpack")
+        from backend.ws.manager import ConnectionManager, FORMAT_MSGPACK
+
+        manager = ConnectionManager()
+        sockets = [self._FakeWebSocket() for _ in range(3)]
+        for ws in sockets:
+            await manager.connect(ws, fmt=FORMAT_MSGPACK)
+            await manager.subscribe(ws, "spy")
+
+        await manager.broadcast({"type": "spy_price", "data": {"last": 583.5}}, channel="spy")
+
+        payloads = [ws.sent[0] for ws in sockets]
+        assert all(isinstance(p, bytes) for p in payloads)
+        assert len({id(p) for p in payloads}) == 1
+
+
+class TestAutoTraderMath:
+    """自動発注の価格・ストライク計算のテスト"""
+
+    def test_cents_exact_limit_price(self):
+        """指値はセント単位の整数になり、/100 で正確な2桁の価格に戻る"""
+        # 1.52 - 0.05 は浮動小数点で 1.4700000000000002
+        assert _cents(1.52 - 0.05) == 147
+        assert _cents(1.52 - 0.05) / 100 == 1.47
+        assert _cents(1.47) == 147
+
+    def test_cents_rounding(self):
+        """0.145 は浮動小数点で 14.4999... セントなので 14 に丸まる（負の値も対称）"""
+        assert _cents(0.145) == 14
+        assert _cents(-0.145) == -14
+        assert _cents(0.155) == 16
+        assert _cents(0.0) == 0
+
+    @pytest.mark.parametrize("spot, dte, iv, target_delta", [
+        (580.0, 7, 0.185, 0.16),
+        (580.0, 1, 0.12, 0.20),
+        (450.0, 30, 0.35, 0.10),
+    ])
+    def test_estimate_strike_round_trips_to_delta(self, spot, dte, iv, target_delta):
+        """推定ストライクでのBSプットデルタが目標デルタに戻る"""
+        strike = _estimate_strike_for_delta(spot, dte, iv, target_delta)
+        assert strike < spot  # OTMプット
+
+        sigma_sqrt_t = iv * math.sqrt(dte / 365)
+        d1 = (math.log(spot / strike) + 0.5 * sigma_sqrt_t ** 2) / sigma_sqrt_t
+        put_delta = NormalDist().cdf(d1) - 1
+        assert put_delta == pytest.approx(-target_delta, abs=1e-9)
+
+    def test_estimate_strike_known_value(self):
+        """S=580, 7DTE, σ=0.185, Δ=-0.16 のストライクは約565.60"""
+        assert _estimate_strike_for_delta(580.0, 7, 0.185, 0.16) == pytest.approx(565.60, abs=0.01)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])